@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark suite for the hot paths of pympi.
+
+Every case runs on synthetic documents of increasing size, the size is the
+number of annotations per tier. For every case and size the fastest wall clock
+time of a number of runs and the peak memory of one run (measured with
+:mod:`tracemalloc`) are reported together with the scaling exponent, the slope
+of the time on a log-log scale. Results can be written as json and two result
+files can be compared to spot regressions.
+
+Usage:
+    PYTHONPATH=. python benchmarks/suite.py [--sizes 100,1000,10000]
+        [--tiers 4] [--depth 2] [--repeat 3] [--cases parse_eaf,to_eaf]
+        [--output results.json]
+    PYTHONPATH=. python benchmarks/suite.py --compare old.json new.json
+        [--threshold 0.1]
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import math
+import pathlib
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pympi import Eaf, TextGrid
+from pympi.Elan import VERSION
+
+
+def generate_eaf(tiers=4, annotations=1000, depth=1, seed=0):
+    """Generate an Eaf object with random annotations. Every root tier gets a
+    chain of ``depth - 1`` symbolic association child tiers where every
+    annotation has a child annotation. Annotations within a tier don't overlap
+    but annotations of different tiers do. Versions without the batch methods
+    add the annotations one by one.
+
+    :param int tiers: Number of root tiers.
+    :param int annotations: Number of annotations per tier.
+    :param int depth: Depth of the tier hierarchy.
+    :param int seed: Seed for the random generator.
+    :returns: The :class:`pympi.Elan.Eaf` object.
+    """
+    rng = random.Random(seed)
+    eaf = Eaf(author='benchmark')
+    eaf.add_linguistic_type('association', 'Symbolic_Association', False)
+    for t in range(tiers):
+        tier = 'tier{}'.format(t)
+        eaf.add_tier(tier)
+        spans, end = [], 0
+        for _ in range(annotations):
+            begin = end + rng.randint(0, 1000)
+            end = begin + rng.randint(100, 2000)
+            spans.append((begin, end, 'word{}'.format(rng.randint(0, 99))))
+        if hasattr(eaf, 'add_annotations'):
+            aids = eaf.add_annotations(tier, spans)
+        else:
+            for span in spans:
+                eaf.add_annotation(tier, *span)
+        for level in range(1, depth):
+            parent, tier = tier, 'tier{}-{}'.format(t, level)
+            eaf.add_tier(tier, 'association', parent)
+            value = 'gloss{}'.format(level)
+            if hasattr(eaf, 'add_ref_annotations'):
+                aids = eaf.add_ref_annotations(
+                    tier, [(aid, value) for aid in aids])
+            else:
+                for begin, end, _ in spans:
+                    eaf.add_ref_annotation(tier, parent, (begin + end) // 2,
+                                           value)
+    return eaf
+
+
+def generate_textgrid(tiers=4, intervals=1000, seed=0):
+    """Generate a TextGrid with random interval tiers. Versions without the
+    batch method add the intervals one by one.
+
+    :param int tiers: Number of tiers.
+    :param int intervals: Number of intervals per tier.
+    :param int seed: Seed for the random generator.
+    :returns: The :class:`pympi.Praat.TextGrid` object.
+    """
+    rng = random.Random(seed)
+    tg = TextGrid(xmax=intervals * 3.0)
+    for t in range(tiers):
+        spans, end = [], 0.0
+        for _ in range(intervals):
+            begin = end + rng.randint(0, 1000) / 1000.0
+            end = begin + rng.randint(100, 2000) / 1000.0
+            spans.append((begin, end, 'word{}'.format(rng.randint(0, 99))))
+        tier = tg.add_tier('tier{}'.format(t))
+        if hasattr(tier, 'add_intervals'):
+            tier.add_intervals(spans)
+        else:
+            for span in spans:
+                tier.add_interval(*span)
+    return tg
+
+
+class Case:
+    """A benchmark case.
+
+    :param str name: Name of the case.
+    :param function setup: Function that prepares the state for one run, it
+        receives the generation parameters and a temporary directory. The
+        setup is not timed.
+    :param function run: Function that is timed, it receives the state.
+    :param int max_size: Largest size the case is run for, ``None`` for no
+        limit. Useful for cases with quadratic behaviour.
+    :param tuple requires: Class and name of the method the case needs, the
+        case is skipped for versions of pympi that don't have it.
+    """
+    def __init__(self, name, setup, run, max_size=None, requires=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.max_size = max_size
+        self.requires = requires
+
+    def available(self):
+        """Check if the installed pympi has the method the case needs."""
+        return self.requires is None or hasattr(*self.requires)
+
+
+_documents = {}
+
+
+def cached_eaf(params):
+    """Give a generated Eaf object, it is generated once per parameters."""
+    key = ('eaf', params['tiers'], params['size'], params['depth'])
+    if key not in _documents:
+        _documents[key] = generate_eaf(
+            params['tiers'], params['size'], params['depth'])
+    return _documents[key]
+
+
+def cached_textgrid(params):
+    """Give a generated TextGrid, it is generated once per parameters."""
+    key = ('textgrid', params['tiers'], params['size'])
+    if key not in _documents:
+        _documents[key] = generate_textgrid(params['tiers'], params['size'])
+    return _documents[key]
+
+
+def cached_file(params, tmp, kind, mode='normal'):
+    """Give the path of a generated document written to disk."""
+    path = tmp / '{}-{}-{}-{}-{}'.format(
+        kind, params['tiers'], params['size'], params['depth'], mode)
+    if not path.exists():
+        if kind == 'eaf':
+            cached_eaf(params).to_file(str(path))
+        else:
+            cached_textgrid(params).to_file(str(path), mode=mode)
+    return str(path)
+
+
+def textgrid_cases(mode):
+    return [
+        Case('textgrid_read_{}'.format(mode),
+             lambda p, tmp: cached_file(p, tmp, 'textgrid', mode),
+             TextGrid),
+        Case('textgrid_write_{}'.format(mode),
+             lambda p, tmp: (cached_textgrid(p), str(tmp / 'out.TextGrid')),
+             lambda s: s[0].to_file(s[1], mode=mode)),
+    ]
+
+
+def clean_time_slots_setup(params, tmp):
+    # Removing every other annotation leaves unused timeslots to clean
+    eaf = copy.deepcopy(cached_eaf(params))
+    for aid in list(eaf.tiers['tier0'][0])[::2]:
+        del eaf.tiers['tier0'][0][aid]
+        del eaf.annotations[aid]
+    return eaf
+
+
+def extract_setup(params, tmp):
+    eaf = cached_eaf(params)
+    begin, end = eaf.get_full_time_interval()
+    return eaf, begin + (end - begin) // 4, end - (end - begin) // 4
+
+
+CASES = [
+    Case('parse_eaf', lambda p, tmp: cached_file(p, tmp, 'eaf'), Eaf),
+    Case('to_eaf', lambda p, tmp: (cached_eaf(p), str(tmp / 'out.eaf')),
+         lambda s: s[0].to_file(s[1])),
+    *textgrid_cases('normal'),
+    *textgrid_cases('short'),
+    *textgrid_cases('binary'),
+    Case('get_gaps_and_overlaps', lambda p, tmp: cached_eaf(p),
+         lambda eaf: list(eaf.get_gaps_and_overlaps('tier0', 'tier1')),
+         max_size=500, requires=(Eaf, 'get_gaps_and_overlaps')),
+    Case('get_gaps_and_overlaps2', lambda p, tmp: cached_eaf(p),
+         lambda eaf: list(eaf.get_gaps_and_overlaps2('tier0', 'tier1')),
+         requires=(Eaf, 'get_gaps_and_overlaps2')),
+    Case('get_overlap_matrix', lambda p, tmp: cached_eaf(p),
+         lambda eaf: eaf.get_overlap_matrix(),
+         requires=(Eaf, 'get_overlap_matrix')),
+    Case('merge_tiers',
+         lambda p, tmp: copy.deepcopy(cached_eaf(p)),
+         lambda eaf: eaf.merge_tiers(['tier0', 'tier1'], 'merged'),
+         requires=(Eaf, 'merge_tiers')),
+    Case('clean_time_slots', clean_time_slots_setup,
+         lambda eaf: eaf.clean_time_slots(),
+         requires=(Eaf, 'clean_time_slots')),
+    Case('extract', extract_setup, lambda s: s[0].extract(s[1], s[2]),
+         requires=(Eaf, 'extract')),
+]
+
+
+def measure(case, params, tmp, repeat):
+    """Run a case, the setup is done before every run.
+
+    :returns: Tuple of the form ``(times, peak)`` with the times in seconds
+        and the peak memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        state = case.setup(params, tmp)
+        start = time.perf_counter()
+        case.run(state)
+        times.append(time.perf_counter() - start)
+    state = case.setup(params, tmp)
+    tracemalloc.start()
+    try:
+        case.run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def scaling_exponent(results):
+    """Give the slope of time against size on a log-log scale, 1 means linear
+    and 2 quadratic. ``None`` when there are less than two sizes.
+    """
+    points = [(math.log(r['size']), math.log(r['time']))
+              for r in results if r['time'] > 0]
+    if len(points) < 2:
+        return None
+    mx = sum(x for x, _ in points) / len(points)
+    my = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mx) ** 2 for x, _ in points)
+    if not sxx:
+        return None
+    return sum((x - mx) * (y - my) for x, y in points) / sxx
+
+
+def run(args):
+    cases = CASES
+    if args.cases:
+        names = args.cases.split(',')
+        unknown = set(names) - {c.name for c in CASES}
+        if unknown:
+            sys.exit('Unknown cases: {}'.format(', '.join(sorted(unknown))))
+        cases = [c for c in CASES if c.name in names]
+    sizes = [int(s) for s in args.sizes.split(',')]
+    results, skipped = [], []
+    print('{:<24} {:>8} {:>12} {:>12}'.format(
+        'case', 'size', 'time (ms)', 'peak (KiB)'))
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        for case in cases:
+            if not case.available():
+                print('{:<24} {:>8}'.format(case.name, 'skipped'))
+                skipped.append(case.name)
+                continue
+            case_results = []
+            for size in sizes:
+                if case.max_size is not None and size > case.max_size:
+                    continue
+                params = {'tiers': args.tiers, 'size': size,
+                          'depth': args.depth}
+                times, peak = measure(case, params, tmp, args.repeat)
+                result = dict(params, case=case.name, time=min(times),
+                              times=times, peak=peak)
+                case_results.append(result)
+                print('{:<24} {:>8} {:>12.2f} {:>12.0f}'.format(
+                    case.name, size, result['time'] * 1000, peak / 1024))
+            exponent = scaling_exponent(case_results)
+            if exponent is not None:
+                print('{:<24} {:>8} {:>12.2f}'.format(
+                    case.name, 'slope', exponent))
+            results.extend(case_results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'pympi': VERSION,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'date': datetime.datetime.now().isoformat(),
+                'results': results, 'skipped': skipped}, f, indent=1)
+
+
+def compare(old_path, new_path, threshold):
+    """Compare two result files.
+
+    :returns: Number of cases that got slower by more than the threshold.
+    """
+    def load(path):
+        with open(path) as f:
+            return {(r['case'], r['tiers'], r['size'], r['depth']): r
+                    for r in json.load(f)['results']}
+    old, new = load(old_path), load(new_path)
+    regressions = 0
+    print('{:<24} {:>8} {:>12} {:>12} {:>8} {:>8}'.format(
+        'case', 'size', 'old (ms)', 'new (ms)', 'time', 'memory'))
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key]['time'] / old[key]['time']
+        memory = new[key]['peak'] / max(old[key]['peak'], 1)
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'slower'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print('{:<24} {:>8} {:>12.2f} {:>12.2f} {:>7.2f}x {:>7.2f}x {}'.format(
+            key[0], key[2], old[key]['time'] * 1000, new[key]['time'] * 1000,
+            ratio, memory, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,10000',
+                        help='comma separated annotations per tier')
+    parser.add_argument('--tiers', type=int, default=4,
+                        help='number of root tiers')
+    parser.add_argument('--depth', type=int, default=2,
+                        help='depth of the tier hierarchy')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs, the fastest is reported')
+    parser.add_argument('--cases', help='comma separated cases to run, '
+                        'one of: {}'.format(', '.join(c.name for c in CASES)))
+    parser.add_argument('--output', help='json file to write the results to')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two json result files')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative change that is reported when '
+                        'comparing')
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the xml backends for reading and writing EAF files.
+
+The sample files from the test directory are scaled up by copying every tier
+a number of times, the copies are written to a temporary directory and then
+read and written with every available backend.
+
+Usage: PYTHONPATH=. python benchmarks/xml_backends.py [--scale 10] [--repeat 3]
+"""
+
+import argparse
+import pathlib
+import tempfile
+import time
+
+from pympi import Eaf
+from pympi.Elan import lxml_etree
+
+TEST_DIR = pathlib.Path(__file__).resolve().parent.parent / 'test'
+BACKENDS = ['etree'] + ([] if lxml_etree is None else ['lxml'])
+
+
+def scale_eaf(eaf, factor):
+    """Copy every tier of an Eaf object ``factor - 1`` times, the copies share
+    the timeslots of the original.
+
+    :param pympi.Elan.Eaf eaf: Object to scale, it is changed in place.
+    :param int factor: Number of times every tier should be present.
+    """
+    tiers = list(eaf.tiers.items())
+    old = list(eaf.annotations)
+    for k in range(1, factor):
+        # References point to annotations in other tiers so the ids of the
+        # whole copy are needed up front
+        ids = dict(zip(old, eaf.reserve_annotation_ids(len(old))))
+        for name, (aligned, ref, attrib, ordinal) in tiers:
+            new_name = '{}-{}'.format(name, k)
+            attrib = dict(attrib, TIER_ID=new_name)
+            if 'PARENT_REF' in attrib:
+                attrib['PARENT_REF'] = '{}-{}'.format(attrib['PARENT_REF'], k)
+            eaf.tiers[new_name] = (
+                {ids[a]: v for a, v in aligned.items()},
+                {ids[a]: (ids[r], v, ids.get(p), s)
+                 for a, (r, v, p, s) in ref.items()},
+                attrib, ordinal + k * len(tiers))
+            eaf.annotations.update(
+                (ids[a], new_name) for a in list(aligned) + list(ref))
+    eaf.reindex_tiers()
+
+
+def best_of(repeat, function, *args, **kwargs):
+    """Give the fastest wall clock time of a number of calls in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=10,
+                        help='number of copies of every tier')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs, the fastest run is reported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        print('{:<16} {:>10} {:>8} {:>10} {:>10}'.format(
+            'file', 'size (kB)', 'backend', 'read (s)', 'write (s)'))
+        for sample in sorted(TEST_DIR.glob('sample_*.eaf')):
+            eaf = Eaf(str(sample), suppress_version_warning=True)
+            scale_eaf(eaf, args.scale)
+            scaled = tmp / sample.name
+            eaf.to_file(str(scaled), backend='etree')
+            size = scaled.stat().st_size // 1024
+            for backend in BACKENDS:
+                read = best_of(args.repeat, Eaf, str(scaled),
+                               suppress_version_warning=True, backend=backend)
+                write = best_of(args.repeat, eaf.to_file,
+                                str(tmp / 'out.eaf'), backend=backend)
+                print('{:<16} {:>10} {:>8} {:>10.3f} {:>10.3f}'.format(
+                    sample.name, size, backend, read, write))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+from pympi._corpus import load, map_jobs
+from pympi.Intervals import get_intervals, intersection, union
+
+
+def confusion(first, second, gap=''):
+    """Give the time both annotators spent on every pair of labels. The
+    boundaries of both tiers are swept once and every segment between two
+    consecutive boundaries adds its duration to the pair of labels covering
+    it. Intervals within a tier are assumed not to overlap.
+
+    :param list first: Intervals of the form ``[(begin, end, value)]``, see
+        :func:`pympi.Intervals.get_intervals`.
+    :param list second: Intervals of the form ``[(begin, end, value)]``.
+    :param str gap: Label for the time only one of the tiers covers, if
+        ``None`` that time is left out. Time covered by neither tier is
+        always left out.
+    :returns: Dictionary of the form ``{(label1, label2) -> duration}``.
+    """
+    tiers = [sorted(first, key=lambda x: x[0]),
+             sorted(second, key=lambda x: x[0])]
+    times = sorted({t for tier in tiers for b, e, *_ in tier for t in (b, e)})
+    positions = [0, 0]
+    result = {}
+    for begin, end in zip(times, times[1:]):
+        labels = []
+        for side, tier in enumerate(tiers):
+            k = positions[side]
+            while k < len(tier) and tier[k][1] <= begin:
+                k += 1
+            positions[side] = k
+            labels.append(tier[k][2] if k < len(tier) and tier[k][0] <= begin
+                          else None)
+        if labels == [None, None]:
+            continue
+        if None in labels:
+            if gap is None:
+                continue
+            labels = [gap if label is None else label for label in labels]
+        key = tuple(labels)
+        result[key] = result.get(key, 0) + end - begin
+    return result
+
+
+def kappa(matrix):
+    """Give Cohen's kappa of a confusion matrix, the chance agreement is
+    computed from the totals of the labels of both annotators.
+
+    :param dict matrix: Confusion matrix of the form
+        ``{(label1, label2) -> weight}``, see :func:`confusion`.
+    :returns: The kappa or ``None`` if it is undefined because the chance
+        agreement is one or the matrix is empty.
+    """
+    total = sum(matrix.values())
+    if not total:
+        return None
+    firsts, seconds = {}, {}
+    observed = 0
+    for (label1, label2), weight in matrix.items():
+        firsts[label1] = firsts.get(label1, 0) + weight
+        seconds[label2] = seconds.get(label2, 0) + weight
+        if label1 == label2:
+            observed += weight
+    observed /= total
+    expected = sum(w * seconds.get(label, 0)
+                   for label, w in firsts.items()) / total ** 2
+    if expected >= 1:
+        return None
+    return (observed - expected) / (1 - expected)
+
+
+def boundary_matches(first, second, tolerance=0.02):
+    """Count the boundaries of two tiers that match within a tolerance.
+    Boundaries shared by consecutive intervals count once and every boundary
+    is matched at most once, the sorted boundaries are merged in a single
+    pass.
+
+    :param list first: Intervals of the form ``[(begin, end, value)]``, see
+        :func:`pympi.Intervals.get_intervals`.
+    :param list second: Intervals of the form ``[(begin, end, value)]``.
+    :param float tolerance: Maximal distance between matching boundaries.
+    :returns: Tuple of the form ``(matches, boundaries1, boundaries2)``.
+    """
+    bounds1 = sorted({t for b, e, *_ in first for t in (b, e)})
+    bounds2 = sorted({t for b, e, *_ in second for t in (b, e)})
+    i = j = matches = 0
+    while i < len(bounds1) and j < len(bounds2):
+        # Rounding keeps differences like 1.51 - 1.5 within 0.01
+        if round(abs(bounds1[i] - bounds2[j]), 9) <= tolerance:
+            matches += 1
+            i, j = i + 1, j + 1
+        elif bounds1[i] < bounds2[j]:
+            i += 1
+        else:
+            j += 1
+    return matches, len(bounds1), len(bounds2)
+
+
+def compare_tiers(first, second, tolerance=0.02, gap=''):
+    """Compare the tiers of two annotators. This is the raw data that
+    :func:`summarize` turns into agreement measures, raw data of several
+    files can be merged with :func:`merge_comparisons`.
+
+    :param list first: Intervals of the form ``[(begin, end, value)]``, see
+        :func:`pympi.Intervals.get_intervals`.
+    :param list second: Intervals of the form ``[(begin, end, value)]``.
+    :param float tolerance: Tolerance for the boundaries, see
+        :func:`boundary_matches`.
+    :param str gap: Label for time annotated by one annotator, see
+        :func:`confusion`.
+    :returns: Dictionary with ``'boundaries'`` of the form ``(matches,
+        boundaries1, boundaries2)``, ``'overlap'`` of the form
+        ``(intersection, union)`` with the durations of the annotated time
+        and ``'confusion'``, see :func:`confusion`.
+    """
+    return {
+        'boundaries': boundary_matches(first, second, tolerance),
+        'overlap': tuple(sum(e - b for b, e in segments) for segments in (
+            intersection(first, second), union(first, second))),
+        'confusion': confusion(first, second, gap)}
+
+
+def merge_comparisons(comparisons):
+    """Merge the raw comparisons of several tiers or files.
+
+    :param list comparisons: Comparisons as given by :func:`compare_tiers`.
+    :returns: A single comparison.
+    """
+    boundaries, overlap, matrix = [0, 0, 0], [0, 0], {}
+    for comparison in comparisons:
+        boundaries = [x + y for x, y in zip(boundaries,
+                                            comparison['boundaries'])]
+        overlap = [x + y for x, y in zip(overlap, comparison['overlap'])]
+        for key, weight in comparison['confusion'].items():
+            matrix[key] = matrix.get(key, 0) + weight
+    return {'boundaries': tuple(boundaries), 'overlap': tuple(overlap),
+            'confusion': matrix}
+
+
+def summarize(comparison):
+    """Give the agreement measures of a raw comparison.
+
+    :param dict comparison: Comparison as given by :func:`compare_tiers` or
+        :func:`merge_comparisons`.
+    :returns: Dictionary with the boundary ``'precision'``, ``'recall'`` and
+        ``'f1'`` where the first tier is the reference, the
+        ``'overlap_ratio'`` of the annotated time, the ``'observed'`` label
+        agreement, the ``'kappa'`` and the ``'confusion'`` matrix. A measure
+        is ``None`` when it is undefined.
+    """
+    matches, n1, n2 = comparison['boundaries']
+    precision = matches / n2 if n2 else None
+    recall = matches / n1 if n1 else None
+    f1 = 2 * matches / (n1 + n2) if n1 + n2 else None
+    both, either = comparison['overlap']
+    matrix = comparison['confusion']
+    total = sum(matrix.values())
+    agreed = sum(w for (l1, l2), w in matrix.items() if l1 == l2)
+    return {
+        'precision': precision, 'recall': recall, 'f1': f1,
+        'overlap_ratio': both / either if either else None,
+        'observed': agreed / total if total else None,
+        'kappa': kappa(matrix),
+        'confusion': matrix}
+
+
+def agreement(first, second, first_tier=None, second_tier=None,
+              tolerance=0.02, gap='', skipempty=True):
+    """Give the agreement between two annotators, either the same tier in two
+    files or two tiers in one file. Times of Eaf objects are converted to
+    seconds so Eaf and Praat tiers can be compared.
+
+    :param first: A :class:`pympi.Elan.Eaf`, :class:`pympi.Praat.TextGrid`,
+        :class:`pympi.Praat.Tier` or a list of intervals, see
+        :func:`pympi.Intervals.get_intervals`.
+    :param second: The other annotation, of the same types.
+    :param first_tier: Name of the first tier, or number for a TextGrid.
+    :param second_tier: Name of the second tier, if ``None`` the first tier
+        name is used.
+    :param float tolerance: Tolerance for the boundaries in seconds.
+    :param str gap: Label for time annotated by one annotator, see
+        :func:`confusion`.
+    :param bool skipempty: Skip the intervals with an empty label.
+    :returns: Agreement measures, see :func:`summarize`.
+    :raises KeyError: If a tier is non existent in an Eaf.
+    :raises IndexError: If a tier is non existent in a TextGrid.
+    """
+    return summarize(_compare_sources(
+        first, second, first_tier, second_tier, tolerance, gap, skipempty))
+
+
+def _compare_sources(first, second, first_tier, second_tier, tolerance, gap,
+                     skipempty):
+    if second_tier is None:
+        second_tier = first_tier
+    intervals = [
+        [i for i in get_intervals(source, tier, seconds=True)
+         if not skipempty or i[2].strip()]
+        for source, tier in ((first, first_tier), (second, second_tier))]
+    return compare_tiers(*intervals, tolerance=tolerance, gap=gap)
+
+
+def _compare_files(job):
+    """Compare one pair of files, run in the worker processes."""
+    first, second, first_tier, second_tier, tolerance, gap, skipempty = job
+    return _compare_sources(load(first), load(second), first_tier,
+                            second_tier, tolerance, gap, skipempty)
+
+
+def agreement_corpus(file_pairs, first_tier, second_tier=None,
+                     tolerance=0.02, gap='', skipempty=True, processes=None):
+    """Give the agreement for pairs of files in parallel, the files are
+    loaded and compared in a pool of processes. The total is computed from
+    the merged counts and durations of all files and not from the measures
+    per file.
+
+    :param list file_pairs: Pairs of file paths of the form
+        ``[(first, second)]``, files ending in ``.eaf`` are read as eaf files
+        and the others as TextGrids. For two tiers in one file the path is
+        given twice.
+    :param first_tier: Name of the first tier, or number for a TextGrid.
+    :param second_tier: Name of the second tier, if ``None`` the first tier
+        name is used.
+    :param float tolerance: Tolerance for the boundaries in seconds.
+    :param str gap: Label for time annotated by one annotator, see
+        :func:`confusion`.
+    :param bool skipempty: Skip the intervals with an empty label.
+    :param int processes: Number of processes, if ``None`` the number of
+        processors is used and if ``1`` no pool is used.
+    :returns: Tuple of the form ``(per_file, total)`` where ``per_file`` is
+        a list of agreement measures in the order of the pairs, see
+        :func:`summarize`.
+    :raises ValueError: If the number of processes is smaller than one.
+    """
+    comparisons = map_jobs(
+        _compare_files, [(first, second, first_tier, second_tier, tolerance,
+                          gap, skipempty) for first, second in file_pairs],
+        processes)
+    return ([summarize(c) for c in comparisons],
+            summarize(merge_comparisons(comparisons)))
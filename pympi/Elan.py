@@ -1,10 +1,18 @@
-from xml.etree import cElementTree as etree
+from xml.etree import ElementTree as etree
+import heapq
+import io
+import itertools
 import re
 import sys
 import time
 import pathlib
 import warnings
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # pragma: no cover
+    lxml_etree = None
+
 VERSION = '1.70.2'
 
 
@@ -57,6 +65,17 @@ class Eaf:
 
     :var dict annotations: Dictionary of annotations of the form:
         ``{id -> tier}``, this is only used internally.
+    :var dict child_tiers: Index of the tier hierarchy of the form:
+        ``{parent -> {child -> None}}``, this is only used internally.
+    :var dict ling_type_tiers: Index of the tiers per linguistic type of the
+        form: ``{ling_type -> {tier -> None}}``, this is only used internally.
+
+    .. note:: The tier hierarchy and the tiers per linguistic type are
+        indexed, when you change the ``PARENT_REF`` or
+        ``LINGUISTIC_TYPE_REF`` of a tier directly instead of using the
+        methods you should call :func:`reindex_tiers` afterwards. Likewise
+        the time bounds are cached, after changing times in ``timeslots``
+        directly you should call :func:`invalidate_time_intervals`.
     """
     ETYPES = {'iso12620', 'ecv', 'cve_id', 'lexen_id', 'resource_url'}
     CONSTRAINTS = {
@@ -71,7 +90,8 @@ class Eaf:
              'mp4': 'video/mp4', 'xml': 'text/xml'}
 
     def __init__(self, file_path=None, author='pympi',
-                 suppress_version_warning=False):
+                 suppress_version_warning=False, backend=None,
+                 validate=False):
         """Construct either a new Eaf file or read on from a file/stream.
 
         :param str file_path: Path to read from, - for stdin. If ``None`` an
@@ -79,6 +99,11 @@ class Eaf:
         :param str author: Author of the file.
         :param bool supress_version_warning: Suppress the warning for
             unsupported EAF file versions
+        :param str backend: Xml backend used for reading, see
+            :func:`pympi.Elan.get_xml_backend`.
+        :param bool validate: Flag to validate the file while reading, see
+            :func:`pympi.Elan.parse_eaf`.
+        :raises ValueError: If validate is set and the file is not valid.
         """
         ctz = -time.altzone if time.localtime(time.time()).tm_isdst and\
             time.daylight else -time.timezone
@@ -105,6 +130,8 @@ class Eaf:
         self.tiers = {}
         self.timeslots = {}
         self.licenses = []
+        self.reindex_tiers()
+        self.invalidate_time_intervals()
         self.linked_file_descriptors = []
         self.media_descriptors = []
         self.properties = []
@@ -115,7 +142,8 @@ class Eaf:
             self.properties.append(('lastUsedAnnotation', 0))
             self.add_tier('default')
         else:
-            parse_eaf(file_path, self, suppress_version_warning)
+            parse_eaf(file_path, self, suppress_version_warning, backend,
+                      validate)
 
     def add_annotation(self, id_tier, start, end, value='', svg_ref=None):
         """Add an annotation.
@@ -125,26 +153,80 @@ class Eaf:
         :param int end: End time of the annotation.
         :param str value: Value of the annotation.
         :param str svg_ref: Svg reference.
+        :returns: Id of the added annotation.
         :raises KeyError: If the tier is non existent.
         :raises ValueError: If one of the values is negative or start is bigger
                             then end or if the tiers already contains ref
                             annotations.
         """
-        if self.tiers[id_tier][1]:
-            raise ValueError('Tier already contains ref annotations...')
-        if not isinstance(start, int) or not isinstance(end, int):
-            raise ValueError('start and end must be an integer...')
-        if start == end:
-            raise ValueError('Annotation length is zero...')
-        if start > end:
-            raise ValueError('Annotation length is negative...')
-        if start < 0:
-            raise ValueError('Start is negative...')
+        self._check_annotations(id_tier, [(start, end)])
         start_ts = self.generate_ts_id(start)
         end_ts = self.generate_ts_id(end)
         aid = self.generate_annotation_id()
         self.annotations[aid] = id_tier
         self.tiers[id_tier][0][aid] = (start_ts, end_ts, value, svg_ref)
+        self._update_tier_time_interval(id_tier, start, end)
+        return aid
+
+    def add_annotations(self, id_tier, annotations, time_slots=None):
+        """Add multiple annotations at once. All annotations are checked
+        before anything is added and boundaries with the same time share a
+        single timeslot.
+
+        :param str id_tier: Name of the tier.
+        :param list annotations: Annotations of the form
+            ``[(start, end, value)]`` or ``[(start, end, value, svg_ref)]``.
+        :param dict time_slots: Timeslots that may be reused of the form
+            ``{time -> ts_id}``. The dictionary is updated with the created
+            timeslots so it can be shared between calls, if ``None`` only
+            boundaries within this call are shared.
+        :returns: List of the ids of the added annotations.
+        :raises KeyError: If the tier is non existent.
+        :raises ValueError: If the tier already contains ref annotations or if
+            one of the annotations is invalid, see :func:`add_annotation`.
+        """
+        annotations = list(annotations)
+        self._check_annotations(id_tier, annotations)
+        if time_slots is None:
+            time_slots = {}
+        tier = self.tiers[id_tier][0]
+        aids = self.reserve_annotation_ids(len(annotations))
+        for aid, (start, end, value, *svg_ref) in zip(aids, annotations):
+            if start not in time_slots:
+                time_slots[start] = self.generate_ts_id(start)
+            if end not in time_slots:
+                time_slots[end] = self.generate_ts_id(end)
+            self.annotations[aid] = id_tier
+            tier[aid] = (time_slots[start], time_slots[end], value,
+                         svg_ref[0] if svg_ref else None)
+        if annotations:
+            self._update_tier_time_interval(
+                id_tier, min(a[0] for a in annotations),
+                max(a[1] for a in annotations))
+        return aids
+
+    def _check_annotations(self, id_tier, annotations):
+        """Check that annotations can be added to a tier, see
+        :func:`add_annotation`.
+
+        :param str id_tier: Name of the tier.
+        :param list annotations: Annotations of the form
+            ``[(start, end, ...)]``.
+        :raises KeyError: If the tier is non existent.
+        :raises ValueError: If the tier already contains ref annotations or if
+            one of the annotations is invalid.
+        """
+        if self.tiers[id_tier][1]:
+            raise ValueError('Tier already contains ref annotations...')
+        for start, end, *_ in annotations:
+            if not isinstance(start, int) or not isinstance(end, int):
+                raise ValueError('start and end must be an integer...')
+            if start == end:
+                raise ValueError('Annotation length is zero...')
+            if start > end:
+                raise ValueError('Annotation length is negative...')
+            if start < 0:
+                raise ValueError('Start is negative...')
 
     def add_controlled_vocabulary(self, cv_id, ext_ref=None):
         """Add a controlled vocabulary. This will initialize the controlled
@@ -321,9 +403,14 @@ class Eaf:
         :param str value: Value of the annotation.
         :param str prev: Id of the previous annotation.
         :param str svg_ref: Svg reference.
+        :returns: Id of the added annotation.
         :raises KeyError: If the tier is non existent.
         :raises ValueError: If the tier already contains normal annotations or
             if there is no annotation in the tier on the time to reference to.
+
+        When you already know the id of the annotation to reference to use
+        :func:`add_ref_annotation_by_id` instead, that doesn't have to search
+        the annotations of ``tier2``.
         """
         if self.tiers[id_tier][0]:
             raise ValueError('This tier already contains normal annotations.')
@@ -347,9 +434,76 @@ class Eaf:
                     break
         if not ann:
             raise ValueError('There is no annotation to reference to.')
-        aid = self.generate_annotation_id()
-        self.annotations[aid] = id_tier
-        self.tiers[id_tier][1][aid] = (ann, value, prev, svg)
+        return self.add_ref_annotation_by_id(id_tier, ann, value, prev, svg)
+
+    def add_ref_annotation_by_id(self, id_tier, ref_id, value='', prev=None,
+                                 svg=None):
+        """Add a reference annotation that refers to a known annotation.
+
+        :param str id_tier: Name of the tier.
+        :param str ref_id: Id of the referenced annotation.
+        :param str value: Value of the annotation.
+        :param str prev: Id of the previous annotation.
+        :param str svg_ref: Svg reference.
+        :returns: Id of the added annotation.
+        :raises KeyError: If the tier is non existent.
+        :raises ValueError: If the tier already contains normal annotations or
+            if the referenced annotation doesn't exist.
+        """
+        return self.add_ref_annotations(id_tier, [(ref_id, value, prev, svg)],
+                                        False)[0]
+
+    def add_ref_annotations(self, id_tier, annotations, link=True):
+        """Add multiple reference annotations that refer to known
+        annotations.
+
+        :param str id_tier: Name of the tier.
+        :param list annotations: Annotations of the form
+            ``[(ref_id, value)]`` or ``[(ref_id, value, prev, svg_ref)]``.
+        :param bool link: Flag to chain the annotations referring to the same
+            annotation in the given order by setting their previous annotation,
+            the first one follows the last annotation that already refers to
+            it. This is only done when the tier has the
+            ``Symbolic_Subdivision`` constraint and when no previous
+            annotation is given.
+        :returns: List of the ids of the added annotations.
+        :raises KeyError: If the tier is non existent.
+        :raises ValueError: If the tier already contains normal annotations or
+            if one of the referenced annotations doesn't exist or isn't on the
+            parent tier, when the tier has one.
+        """
+        tier = self.tiers[id_tier]
+        if tier[0]:
+            raise ValueError('This tier already contains normal annotations.')
+        annotations = list(annotations)
+        parent = tier[2].get('PARENT_REF')
+        for ref_id, *_ in annotations:
+            if ref_id not in self.annotations:
+                raise ValueError('There is no annotation to reference to.')
+            if parent is not None and self.annotations[ref_id] != parent:
+                raise ValueError('The referenced annotation is not on the '
+                                 'parent tier: {}'.format(ref_id))
+        ling = self.linguistic_types.get(tier[2].get('LINGUISTIC_TYPE_REF'))
+        link = link and ling is not None and\
+            ling.get('CONSTRAINTS') == 'Symbolic_Subdivision'
+        last = {}
+        if link:
+            # The last existing child is the one no other child follows
+            refs = {ref_id for ref_id, *_ in annotations}
+            prevs = {ann[2] for ann in tier[1].values()}
+            for aid, (ref_id, _, _, _) in tier[1].items():
+                if ref_id in refs and aid not in prevs:
+                    last[ref_id] = aid
+        aids = self.reserve_annotation_ids(len(annotations))
+        for aid, (ref_id, value, *rest) in zip(aids, annotations):
+            prev, svg = (rest + [None, None])[:2]
+            if link and prev is None:
+                prev = last.get(ref_id)
+            last[ref_id] = aid
+            self.annotations[aid] = id_tier
+            tier[1][aid] = (ref_id, value, prev, svg)
+        self._tier_intervals.pop(id_tier, None)
+        return aids
 
     def add_secondary_linked_file(self, file_path, relpath=None, mimetype=None,
                                   time_origin=None, assoc_with=None):
@@ -372,6 +526,105 @@ class Eaf:
             'MIME_TYPE': mimetype, 'TIME_ORIGIN': time_origin,
             'ASSOCIATED_WITH': assoc_with})
 
+    def add_textgrid_tiers(self, textgrid, parent, tiers=None, prefix='',
+                           ling=None, skipempty=True, pointlength=0.1,
+                           tolerance=0, min_ratio=0):
+        """Add tiers of a TextGrid as child tiers of a time alignable tier,
+        for example the word and phone tiers of a forced alignment under an
+        utterance tier. Every interval is joined with the annotation of the
+        parent tier it overlaps most, see
+        :func:`pympi.Intervals.interval_join`, and clipped to it. Intervals
+        without a parent annotation are dropped. Boundaries that coincide with
+        the boundaries of the parent annotation share its timeslots and the
+        annotations of every tier are added in bulk.
+
+        :param pympi.Praat.TextGrid textgrid: The TextGrid.
+        :param str parent: Name of the parent tier.
+        :param list tiers: Names or numbers of the TextGrid tiers to add, if
+            ``None`` all tiers are added.
+        :param str prefix: Prefix for the names of the new tiers.
+        :param str ling: Linguistic type of the new tiers, if ``None`` the
+            first linguistic type with the ``Included_In`` constraint is used
+            and created when there is none.
+        :param bool skipempty: Skip the empty intervals.
+        :param float pointlength: Length of the annotations created from
+            points in seconds.
+        :param int tolerance: Maximum distance in milliseconds for a boundary
+            to be moved to the boundary of the parent annotation.
+        :param float min_ratio: Minimal overlap with the parent annotation as
+            a fraction of the duration of the shorter of the two.
+        :returns: Dictionary of the form ``{tier_name -> [annotation_id]}``.
+        :raises KeyError: If the parent tier or the linguistic type is non
+            existent.
+        :raises IndexError: If a TextGrid tier is non existent.
+        :raises ValueError: If a new tier already exists, two TextGrid tiers
+            give the same name or the parent tier is not time alignable.
+        """
+        from pympi.Intervals import interval_join
+        parent_ling = self.linguistic_types.get(
+            self.tiers[parent][2].get('LINGUISTIC_TYPE_REF'), {})
+        if parent_ling.get('TIME_ALIGNABLE') != 'true':
+            raise ValueError('Parent tier is not time alignable...')
+        if ling is None:
+            ling = next((k for k, v in self.linguistic_types.items()
+                         if v.get('CONSTRAINTS') == 'Included_In'), None)
+            if ling is None:
+                ling = 'included_in'
+                self.add_linguistic_type(ling, 'Included_In')
+        elif ling not in self.linguistic_types:
+            raise KeyError('Linguistic type not present: {}'.format(ling))
+        if tiers is None:
+            tiers = list(textgrid.get_tiers())
+        else:
+            tiers = [textgrid.get_tier(tier) for tier in tiers]
+        names = set()
+        for tier in tiers:
+            name = prefix + tier.name
+            if name in self.tiers or name in names:
+                raise ValueError('Tier already exists: {}'.format(name))
+            names.add(name)
+        # The parent boundaries seed the timeslots so they are reused
+        time_slots = {}
+        parents = []
+        for ts1, ts2, _, _ in self.tiers[parent][0].values():
+            begin, end = self.timeslots[ts1], self.timeslots[ts2]
+            if begin is not None and end is not None:
+                parents.append((begin, end))
+                time_slots.setdefault(begin, ts1)
+                time_slots.setdefault(end, ts2)
+        added = {}
+        for tier in tiers:
+            if tier.tier_type == 'TextTier':
+                ints = ((p, p+pointlength, v) for p, v in tier.get_intervals())
+            else:
+                ints = tier.get_intervals()
+            children = [
+                (int(round(begin*1000)), int(round(end*1000)), value, k)
+                for k, (begin, end, value) in enumerate(ints)
+                if value.strip() or not skipempty]
+            best = {}
+            for par, child, overlap in interval_join(
+                    parents, children, min_ratio=min_ratio):
+                if child[3] not in best or overlap > best[child[3]][0]:
+                    best[child[3]] = (overlap, par)
+            annotations = []
+            for begin, end, value, k in children:
+                if k not in best:
+                    continue
+                pbegin, pend = best[k][1]
+                if abs(begin - pbegin) <= tolerance:
+                    begin = pbegin
+                if abs(end - pend) <= tolerance:
+                    end = pend
+                begin, end = max(begin, pbegin), min(end, pend)
+                if begin < end:
+                    annotations.append((begin, end, value))
+            name = prefix + tier.name
+            self.add_tier(name, ling, parent)
+            added[name] = self.add_annotations(
+                name, sorted(annotations), time_slots)
+        return added
+
     def add_tier(self, tier_id, ling='default-lt', parent=None, locale=None,
                  part=None, ann=None, language=None, tier_dict=None):
         """Add a tier. When no linguistic type is given and the default
@@ -402,6 +655,9 @@ class Eaf:
             locale = None
         if language and language not in self.languages:
             language = None
+        if tier_id in self.tiers:
+            self._unindex_tier(tier_id)
+        self._tier_intervals.pop(tier_id, None)
         if tier_dict is None:
             self.tiers[tier_id] = ({}, {}, {
                 'TIER_ID': tier_id,
@@ -413,6 +669,7 @@ class Eaf:
                 'ANNOTATOR': ann}, len(self.tiers))
         else:
             self.tiers[tier_id] = ({}, {}, tier_dict, len(self.tiers))
+        self._index_tier(tier_id)
 
     def child_tiers_for(self, id_tier):
         """.. deprecated: 1.5
@@ -433,6 +690,7 @@ class Eaf:
         ts = ((a[0], a[1]) for t in self.tiers.values() for a in t[0].values())
         for a in {a for b in ts for a in b} ^ set(self.timeslots):
             del(self.timeslots[a])
+        self._time_interval = None
 
     def copy_tier(self, eaf_obj, tier_name):
         """Copies a tier to another :class:`pympi.Elan.Eaf` object.
@@ -490,12 +748,11 @@ class Eaf:
 
         align_tier_names = []
         ref_tier_names = []
-        for t in eaf_out.get_tier_names():
-            t_type = eaf_out.tiers[t][2]['LINGUISTIC_TYPE_REF']
+        for t_type, tiers in eaf_out.ling_type_tiers.items():
             if eaf_out.linguistic_types[t_type]['TIME_ALIGNABLE'] == 'true':
-                align_tier_names.append(t)
+                align_tier_names.extend(tiers)
             else:
-                ref_tier_names.append(t)
+                ref_tier_names.extend(tiers)
 
         # Make sure that annotations on reference tiers are removed first (so
         # that it's possible to look up their start and end times from their
@@ -528,25 +785,39 @@ class Eaf:
         """
         if tier_name is None:
             tier_name = '{}_filter'.format(tier)
-        self.add_tier(tier_name)
-        func = (lambda x, y: re.match(x, y)) if regex else lambda x, y: x == y
-        for begin, end, value in self.get_annotation_data_for_tier(tier):
-            if (filtin and not any(func(f, value) for f in filtin)) or\
-                    (filtex and any(func(f, value) for f in filtex)):
-                continue
-            if not safe or end > begin:
-                self.add_annotation(tier_name, begin, end, value)
-        self.clean_time_slots()
+        self.filter_annotations_to_tiers(
+            tier, {tier_name: AnnotationFilter(filtin, filtex, regex)}, safe)
         return tier_name
 
+    def filter_annotations_to_tiers(self, tier, filters, safe=False):
+        """Filter the annotations of a tier into one or more new tiers in a
+        single pass.
+
+        :param str tier: Name of the tier.
+        :param dict filters: Filters of the form
+            ``{tier_name -> AnnotationFilter}``, for every item a tier is
+            created containing the annotations matching the filter.
+        :param bool safe: Ignore zero length annotations(when working with
+            possible malformed data).
+        :returns: List of names of the created tiers.
+        :raises KeyError: If the tier is non existent.
+        """
+        anns = self.get_annotation_data_for_tier(tier)
+        if safe:
+            anns = [a for a in anns if a[1] > a[0]]
+        for tier_name, filt in filters.items():
+            self.add_tier(tier_name)
+            self.add_annotations(tier_name, (
+                (begin, end, value) for begin, end, value, *_ in anns
+                if filt.match(value)))
+        return list(filters)
+
     def generate_annotation_id(self):
         """Generate the next annotation id, this function is mainly used
         internally.
         """
         if not self.maxaid:
-            valid_anns = [int(''.join(filter(str.isdigit, a)))
-                          for a in self.timeslots]
-            self.maxaid = max(valid_anns + [1])+1
+            self.maxaid = max(map(id_number, self.annotations), default=1)+1
         else:
             self.maxaid += 1
         return 'a{:d}'.format(self.maxaid)
@@ -562,15 +833,50 @@ class Eaf:
             raise ValueError('Time is negative...')
 
         if not self.maxts:
-            valid_ts = [int(''.join(filter(str.isdigit, a)))
-                        for a in self.timeslots]
-            self.maxts = max(valid_ts + [1])+1
+            self.maxts = max(map(id_number, self.timeslots), default=1)+1
         else:
             self.maxts += 1
         ts = 'ts{:d}'.format(self.maxts)
         self.timeslots[ts] = time
+        if time is not None and self._time_interval is not None:
+            self._time_interval = (min(self._time_interval[0], time),
+                                   max(self._time_interval[1], time))
         return ts
 
+    def reserve_annotation_ids(self, n):
+        """Reserve a block of annotation ids, the ids will never be handed
+        out by :func:`generate_annotation_id`. This is useful for bulk inserts
+        or when building annotations elsewhere before adding them.
+
+        :param int n: Number of ids to reserve.
+        :returns: List of the reserved ids in ascending order.
+        :raises ValueError: If ``n`` is negative.
+        """
+        if n < 0:
+            raise ValueError('Number of ids is negative...')
+        if not self.maxaid:
+            self.maxaid = max(map(id_number, self.annotations), default=1)
+        first = self.maxaid + 1
+        self.maxaid += n
+        return ['a{:d}'.format(i) for i in range(first, self.maxaid + 1)]
+
+    def reserve_ts_ids(self, n):
+        """Reserve a block of timeslot ids, the ids will never be handed out
+        by :func:`generate_ts_id`. The timeslots are not created, assign a
+        time to them in :attr:`timeslots` before using them.
+
+        :param int n: Number of ids to reserve.
+        :returns: List of the reserved ids in ascending order.
+        :raises ValueError: If ``n`` is negative.
+        """
+        if n < 0:
+            raise ValueError('Number of ids is negative...')
+        if not self.maxts:
+            self.maxts = max(map(id_number, self.timeslots), default=1)
+        first = self.maxts + 1
+        self.maxts += n
+        return ['ts{:d}'.format(i) for i in range(first, self.maxts + 1)]
+
     def get_annotation_data_at_time(self, id_tier, time):
         """Give the annotations at the given time. When the tier contains
         reference annotations this will be returned, check
@@ -659,39 +965,102 @@ class Eaf:
                 for b in a]
     
     def get_annotation_data_for_symbsub_tier(self, id_tier):
-        """"Give a list of all annotations of id_tier with their calculated start, end and value of the form:
-        ``[(start, end, value, value)]``
+        """Give a list of all annotations of a reference tier with their
+        calculated start and end of the form: ``[(start, end, value)]``. The
+        span of every referenced annotation is divided evenly over the
+        annotations referring to it, in the order given by their previous
+        annotations. When the referenced annotations are reference annotations
+        themselves their calculated spans are used. Unaligned annotations get
+        ``None`` as start and end.
 
         :param str id_tier: Name of the tier.
         :raises KeyError: If the tier is non existent.
-        :returns: Reference annotations within that tier.
+        :raises ValueError: If the parent tiers form a cycle.
+        :returns: Reference annotations within that tier ordered by time.
         """
-        ref_ann = self.get_ref_annotation_data_for_tier(id_tier)
-        bucket = []
-        children = []
-        begin,end,value,ref = ref_ann[0]
-        prevEnd = end
-        for i in range(0, len(ref_ann)-1):
-            if ref_ann[i][1] == prevEnd:
-                children.append([ref_ann[i][0],ref_ann[i][1],ref_ann[i][2]])
+        ref = self.tiers[id_tier][1]
+        spans = self._get_ref_annotation_spans(id_tier)
+        return sorted(((b, e, ref[aid][1]) for aid, (b, e) in spans.items()),
+                      key=lambda x: (x[0] is None, x[0] or 0, x[1] or 0))
+
+    def _get_ref_annotation_spans(self, id_tier):
+        """Calculate the spans of the reference annotations in a tier, see
+        :func:`get_annotation_data_for_symbsub_tier`. The chain of parent
+        tiers is walked up to the first tier without reference annotations
+        and the spans are calculated from the top down.
+
+        :param str id_tier: Name of the tier.
+        :returns: Dictionary of the form ``{id: (start, end)}``.
+        :raises KeyError: If the tier is non existent.
+        :raises ValueError: If the parent tiers form a cycle.
+        """
+        chain = [id_tier]
+        tier = self.tiers[id_tier][2].get('PARENT_REF')
+        while tier in self.tiers and self.tiers[tier][1]:
+            if tier in chain:
+                raise ValueError('The parent tiers of {} form a cycle...'
+                                 .format(id_tier))
+            chain.append(tier)
+            tier = self.tiers[tier][2].get('PARENT_REF')
+        known = {}
+        for tier in reversed(chain):
+            spans = {}
+            for parent, children in self.get_ref_annotation_order(
+                    tier).items():
+                if parent not in self.annotations:
+                    continue
+                ptier = self.annotations[parent]
+                if parent in self.tiers[ptier][0]:
+                    begin, end = self.tiers[ptier][0][parent][:2]
+                    begin, end = self.timeslots[begin], self.timeslots[end]
+                else:
+                    begin, end = known.get(parent, (None, None))
+                if begin is None or end is None:
+                    spans.update((aid, (None, None)) for aid in children)
+                    continue
+                n = len(children)
+                for i, aid in enumerate(children):
+                    spans[aid] = (begin + (end - begin) * i // n,
+                                  begin + (end - begin) * (i + 1) // n)
+            known.update(spans)
+        return spans
+
+    def get_ref_annotation_order(self, id_tier):
+        """Give the reference annotations of a tier grouped by the annotation
+        they refer to, in the order given by their previous annotations. This
+        is calculated in one pass over the tier. Annotations without a (valid)
+        previous annotation start a new chain, annotations that are not
+        reachable through the chains, for example because of a cycle, are
+        placed at the end.
+
+        :param str id_tier: Name of the tier.
+        :raises KeyError: If the tier is non existent.
+        :returns: Dictionary of the form ``{ref_id: [id]}``.
+        """
+        ref = self.tiers[id_tier][1]
+        heads = {}
+        following = {}
+        for aid, (parent, _, prev, _) in ref.items():
+            if prev not in ref or prev == aid or ref[prev][0] != parent:
+                heads.setdefault(parent, []).append(aid)
             else:
-                nbChildren = len(children)
-                duration = round((children[nbChildren-1][1] - children[0][0])/nbChildren)
-                for j in range(0,nbChildren-1):
-                    children[j][0] = begin
-                    children[j][1] = children[j][0] + duration
-                    begin = children[j][1]
-                children[nbChildren-1][0] = begin
-                children[nbChildren-1][1] = prevEnd
-                for child in children:
-                    bucket.append((child[0],child[1],child[2]))
-                children = []
-                prevEnd = ref_ann[i][1]
-                begin = ref_ann[i][0]
-                children.append([begin, end, ref_ann[i][2]])
-        #print('bucket');print(bucket)
-        return bucket
-    
+                heads.setdefault(parent, [])
+                following.setdefault(prev, aid)
+        order = {}
+        seen = set()
+        for parent, chains in heads.items():
+            children = order[parent] = []
+            for aid in chains:
+                while aid is not None and aid not in seen:
+                    seen.add(aid)
+                    children.append(aid)
+                    aid = following.get(aid)
+        if len(seen) < len(ref):
+            for aid, (parent, _, _, _) in ref.items():
+                if aid not in seen:
+                    order[parent].append(aid)
+        return order
+
     def get_child_tiers_for(self, id_tier):
         """Give all child tiers for a tier.
 
@@ -700,8 +1069,7 @@ class Eaf:
         :raises KeyError: If the tier is non existent.
         """
         self.tiers[id_tier]
-        return [m for m in self.tiers if 'PARENT_REF' in self.tiers[m][2] and
-                self.tiers[m][2]['PARENT_REF'] == id_tier]
+        return list(self.child_tiers.get(id_tier, ()))
 
     def get_full_time_interval(self):
         """Give the full time interval of the file. Note that the real interval
@@ -709,9 +1077,50 @@ class Eaf:
 
         :returns: Tuple of the form: ``(min_time, max_time)``.
         """
-        return (0, 0) if not self.timeslots else\
-            (min(v for v in self.timeslots.values() if v is not None),
-             max(v for v in self.timeslots.values() if v is not None))
+        return self.full_time_interval
+
+    @property
+    def full_time_interval(self):
+        """The full time interval of the file of the form:
+        ``(min_time, max_time)``, see :func:`get_full_time_interval`. The
+        interval is kept up to date when timeslots are added and recomputed
+        lazily after timeslots are removed or shifted.
+        """
+        if self._time_interval is None:
+            times = [v for v in self.timeslots.values() if v is not None]
+            if not times:
+                return (0, 0)
+            self._time_interval = (min(times), max(times))
+        return self._time_interval
+
+    @property
+    def tier_time_intervals(self):
+        """The time interval per tier of the form:
+        ``{tier_name -> (min_time, max_time)}`` where the interval of a tier
+        without annotations is ``None``. Intervals are cached per tier, kept up
+        to date when annotations are added and recomputed lazily after
+        annotations are removed or shifted.
+        """
+        for id_tier in self.tiers:
+            if id_tier not in self._tier_intervals:
+                anns = [a for a in self.get_annotation_data_for_tier(id_tier)
+                        if a[0] is not None and a[1] is not None]
+                self._tier_intervals[id_tier] = None if not anns else\
+                    (min(a[0] for a in anns), max(a[1] for a in anns))
+        return dict(self._tier_intervals)
+
+    def invalidate_time_intervals(self):
+        """Reset the cached time intervals of the file and of the tiers, this
+        is only needed after changing ``timeslots`` directly.
+        """
+        self._time_interval = None
+        self._tier_intervals = {}
+
+    def _update_tier_time_interval(self, id_tier, start, end):
+        if id_tier in self._tier_intervals:
+            interval = self._tier_intervals[id_tier]
+            self._tier_intervals[id_tier] = (start, end) if interval is None\
+                else (min(interval[0], start), max(interval[1], end))
 
     def get_gaps_and_overlaps(self, tier1, tier2, maxlen=-1):
         """Give gaps and overlaps. The return types are shown in the table
@@ -916,6 +1325,27 @@ class Eaf:
         """
         return self.locales
 
+    def get_overlap_matrix(self, tiers=None):
+        """Give for every pair of tiers how long and how often they overlap,
+        for example between speakers, in one sweep over all the tiers. See
+        :func:`pympi.Intervals.overlap_matrix`.
+
+        :param list tiers: Names of the tiers, if ``None`` all tiers without a
+            parent are used.
+        :returns: Tuple of the form ``(tiers, durations, counts)`` where the
+            matrices are lists of lists in the order of the tiers. The
+            diagonal holds the time a tier is active and the number of
+            stretches of activity.
+        :raises KeyError: If a tier is non existent.
+        """
+        from pympi.Intervals import get_intervals, overlap_matrix
+        if tiers is None:
+            tiers = [t for t, (_, _, attrib, _) in self.tiers.items()
+                     if not attrib.get('PARENT_REF')]
+        tiers = list(tiers)
+        return (tiers,) + overlap_matrix(
+            [get_intervals(self, tier) for tier in tiers])
+
     def get_parameters_for_linguistic_type(self, lingtype):
         """Give the parameter dictionary, this is usable in
         :func:`add_linguistic_type`.
@@ -966,7 +1396,7 @@ class Eaf:
         :raises KeyError: If the tier is non existent.
         """
         befores = self.get_ref_annotation_data_between_times(
-            id_tier, time, self.get_full_time_interval())
+            id_tier, time, self.get_full_time_interval()[1])
         if befores:
             return [min(befores, key=lambda x: x[0])]
         else:
@@ -1048,9 +1478,32 @@ class Eaf:
         :returns: List of tiernames.
         :raises KeyError: If a tier or linguistic type is non existent.
         """
-        return [t for t in self.tiers if
-                self.tiers[t][2]['LINGUISTIC_TYPE_REF'] == ling_type and
-                (parent is None or self.tiers[t][2]['PARENT_REF'] == parent)]
+        return [t for t in self.ling_type_tiers.get(ling_type, ()) if
+                parent is None or self.tiers[t][2].get('PARENT_REF') == parent]
+
+    def get_tier_hierarchy_order(self):
+        """Give all tier names ordered such that every tier comes after its
+        parent tier. Tiers without (an existing) parent are ordered by their
+        ordinal. The order is cached until the tiers change.
+
+        :returns: Tuple of all tier names.
+        """
+        if self._tier_order is None:
+            roots = sorted((t for t, v in self.tiers.items()
+                            if v[2].get('PARENT_REF') not in self.tiers),
+                           key=lambda t: self.tiers[t][3], reverse=True)
+            order = []
+            while roots:
+                tier = roots.pop()
+                order.append(tier)
+                roots.extend(reversed(list(self.child_tiers.get(tier, ()))))
+            # Tiers in a parent cycle are never reached from a root
+            if len(order) < len(self.tiers):
+                seen = set(order)
+                order.extend(sorted((t for t in self.tiers if t not in seen),
+                                    key=lambda t: self.tiers[t][3]))
+            self._tier_order = tuple(order)
+        return self._tier_order
 
     def get_tier_names(self):
         """List all the tier names.
@@ -1088,26 +1541,42 @@ class Eaf:
             possible malformed data).
         :returns: Name of the created tier.
         :raises KeyError: If a tier is non existent.
+        :raises ValueError: If a merged annotation has length zero and
+            ``safe`` is not set.
+
+        The merged annotations reuse the timeslots of the boundaries of the
+        original annotations.
         """
+        def spans(tier):
+            if self.tiers[tier][1]:
+                anns = ((self.get_parent_aligned_annotation(aid), a[1])
+                        for aid, a in self.tiers[tier][1].items())
+            else:
+                anns = ((a, a[2]) for a in self.tiers[tier][0].values())
+            return sorted((self.timeslots[a[0]], self.timeslots[a[1]], value,
+                           a[0], a[1]) for a, value in anns)
+        sources = [spans(t) for t in tiers]
         if tiernew is None:
             tiernew = u'{}_merged'.format('_'.join(tiers))
-        self.add_tier(tiernew)
-        aa = [(sys.maxsize, sys.maxsize, None)] + sorted((
-            a for t in tiers for a in self.get_annotation_data_for_tier(t)),
-            reverse=True)
-        l = None
-        while aa:
-            begin, end, value = aa.pop()
-            if l is None:
-                l = [begin, end, [value]]
-            elif begin - l[1] >= gapt:
-                if not safe or l[1] > l[0]:
-                    self.add_annotation(tiernew, l[0], l[1], sep.join(l[2]))
-                l = [begin, end, [value]]
+        merged = []
+        for begin, end, value, begin_ts, end_ts in heapq.merge(*sources):
+            if merged and begin - merged[-1][1] < gapt:
+                last = merged[-1]
+                if end > last[1]:
+                    last[1], last[4] = end, end_ts
+                last[2].append(value)
             else:
-                if end > l[1]:
-                    l[1] = end
-                l[2].append(value)
+                merged.append([begin, end, [value], begin_ts, end_ts])
+        if safe:
+            merged = [m for m in merged if m[1] > m[0]]
+        elif any(m[1] == m[0] for m in merged):
+            raise ValueError('Annotation length is zero...')
+        self.add_tier(tiernew)
+        tier = self.tiers[tiernew][0]
+        for _, _, values, begin_ts, end_ts in merged:
+            aid = self.generate_annotation_id()
+            self.annotations[aid] = tiernew
+            tier[aid] = (begin_ts, end_ts, sep.join(values), None)
         return tiernew
 
     def remove_all_annotations_from_tier(self, id_tier, clean=True):
@@ -1123,6 +1592,7 @@ class Eaf:
 
         self.tiers[id_tier][0].clear()
         self.tiers[id_tier][1].clear()
+        self._tier_intervals.clear()
         if clean:
             self.clean_time_slots()
 
@@ -1147,6 +1617,7 @@ class Eaf:
             del(self.tiers[id_tier][0][b[0]])
             del(self.annotations[b[0]])
             removed += 1
+        self._tier_intervals.clear()
         if clean:
             self.clean_time_slots()
         return removed
@@ -1285,6 +1756,7 @@ class Eaf:
                 bucket.append(aid)
         for aid in bucket:
             del(self.tiers[id_tier][1][aid])
+        self._tier_intervals.clear()
         return removed
 
     def remove_secondary_linked_files(self, file_path=None, relpath=None,
@@ -1322,7 +1794,9 @@ class Eaf:
         :param bool clean: Flag to also clean the timeslots.
         :raises KeyError: If tier is non existent.
         """
+        self._unindex_tier(id_tier)
         del(self.tiers[id_tier])
+        self._tier_intervals.clear()
         if clean:
             self.clean_time_slots()
 
@@ -1346,42 +1820,124 @@ class Eaf:
         :throws KeyError: If the tier doesnt' exist.
         """
         childs = self.get_child_tiers_for(id_from)
+        self._unindex_tier(id_from)
+        self._tier_intervals.pop(id_to, None)
+        if id_from in self._tier_intervals:
+            self._tier_intervals[id_to] = self._tier_intervals.pop(id_from)
         self.tiers[id_to] = self.tiers.pop(id_from)
         self.tiers[id_to][2]['TIER_ID'] = id_to
+        self._index_tier(id_to)
         for child in childs:
+            self._unindex_tier(child)
             self.tiers[child][2]['PARENT_REF'] = id_to
-
-    def shift_annotations(self, time):
+            self._index_tier(child)
+
+    def reindex_tiers(self):
+        """Rebuild the tier hierarchy and linguistic type indices, this is
+        only needed after changing the attributes of tiers directly.
+        """
+        self.child_tiers = {}
+        self.ling_type_tiers = {}
+        self._tier_order = None
+        for tier_id in self.tiers:
+            self._index_tier(tier_id)
+
+    def _index_tier(self, tier_id):
+        attrib = self.tiers[tier_id][2]
+        parent = attrib.get('PARENT_REF')
+        if parent:
+            self.child_tiers.setdefault(parent, {})[tier_id] = None
+        self.ling_type_tiers.setdefault(
+            attrib.get('LINGUISTIC_TYPE_REF'), {})[tier_id] = None
+        self._tier_order = None
+
+    def _unindex_tier(self, tier_id):
+        attrib = self.tiers[tier_id][2]
+        for index, key in ((self.child_tiers, attrib.get('PARENT_REF')),
+                           (self.ling_type_tiers,
+                            attrib.get('LINGUISTIC_TYPE_REF'))):
+            if key in index:
+                index[key].pop(tier_id, None)
+                if not index[key]:
+                    del(index[key])
+        self._tier_order = None
+
+    def shift_annotations(self, time, tier_offsets=None, scale=1):
         """Shift all annotations in time. Annotations that are in the beginning
         and a left shift is applied can be squashed or discarded.
 
+        The shift is applied on the timeslots, every timeslot is shifted
+        exactly once even when it is shared by multiple annotations. Timeslots
+        that were only used by discarded annotations are removed.
+
         :param int time: Time shift width, negative numbers make a left shift.
+        :param dict tier_offsets: Extra shift per tier of the form
+            ``{tier_name -> offset}``, the offset is added to ``time``. When
+            a timeslot is shared by tiers with different offsets it is split.
+        :param float scale: Factor all times are multiplied with before
+            shifting, this can be used to correct a linear drift.
         :returns: Tuple of a list of squashed annotations and a list of removed
                   annotations in the format: ``(tiername, start, end, value)``.
-        """
+        :raises KeyError: If a tier in ``tier_offsets`` is non existent.
+        """
+        tier_offsets = tier_offsets or {}
+        for name in tier_offsets:
+            if name not in self.tiers:
+                raise KeyError('Tier non existent: {}'.format(name))
+        # Assign an offset to every used timeslot and split the timeslots that
+        # are shared between tiers with a different offset
+        slot_offset = {}
+        refcount = {}
+        for name, tier in self.tiers.items():
+            offset = time + tier_offsets.get(name, 0)
+            splits = {}
+            for aid, (begin, end, value, svg_ref) in tier[0].items():
+                new = []
+                for ts in (begin, end):
+                    if slot_offset.setdefault(ts, offset) != offset:
+                        if ts not in splits:
+                            splits[ts] = self.generate_ts_id(
+                                self.timeslots[ts])
+                            slot_offset[splits[ts]] = offset
+                        ts = splits[ts]
+                    refcount[ts] = refcount.get(ts, 0) + 1
+                    new.append(ts)
+                if new[0] != begin or new[1] != end:
+                    tier[0][aid] = (new[0], new[1], value, svg_ref)
+
+        def move(ts, t):
+            if t is None:
+                return None
+            t = t * scale + slot_offset.get(ts, time)
+            return t if isinstance(t, int) else int(round(t))
+        shifted = {ts: move(ts, t) for ts, t in self.timeslots.items()}
+
         total_re = []
         total_sq = []
         for name, tier in self.tiers.items():
-            squashed = []
-            for aid, (begin, end, value, _) in tier[0].items():
-                if self.timeslots[end]+time <= 0:
-                    squashed.append((name, aid))
-                elif self.timeslots[begin]+time < 0:
-                    total_sq.append((name, self.timeslots[begin],
-                                     self.timeslots[end], value))
-                    self.timeslots[begin] = 0
-                else:
-                    self.timeslots[begin] += time
-                    self.timeslots[end] += time
-            for name, aid in squashed:
-                start, end, value, _ = self.tiers[name][0][aid]
-                del(self.tiers[name][0][aid])
+            anns = tier[0]
+            removed = [aid for aid, a in anns.items()
+                       if shifted[a[1]] is not None and shifted[a[1]] <= 0]
+            total_sq.extend(
+                (name, self.timeslots[a[0]], self.timeslots[a[1]], a[2])
+                for a in anns.values() if shifted[a[0]] is not None and
+                shifted[a[0]] < 0 < shifted[a[1]])
+            for aid in removed:
+                begin, end, value, _ = anns.pop(aid)
                 del(self.annotations[aid])
-                total_re.append(
-                    (name, self.timeslots[start], self.timeslots[end], value))
+                total_re.append((name, self.timeslots[begin],
+                                 self.timeslots[end], value))
+                for ts in (begin, end):
+                    refcount[ts] -= 1
+                    if not refcount[ts]:
+                        del(shifted[ts])
+        self.timeslots.clear()
+        self.timeslots.update((ts, t if t is None or t > 0 else 0)
+                              for ts, t in shifted.items())
+        self.invalidate_time_intervals()
         return total_sq, total_re
 
-    def to_file(self, file_path, pretty=True):
+    def to_file(self, file_path, pretty=True, backend=None):
         """Write the object to a file, if the file already exists a backup will
         be created with the ``.bak`` suffix.
 
@@ -1389,34 +1945,193 @@ class Eaf:
         :param bool pretty: Flag for pretty XML printing (Only unset this if
             you are afraid of wasting bytes because it won't print unneccesary
             whitespace).
+        :param str backend: Xml backend used for writing, see
+            :func:`pympi.Elan.get_xml_backend`.
         """
-        to_eaf(file_path, self, pretty)
+        to_eaf(file_path, self, pretty, backend)
 
-    def to_textgrid(self, filtin=[], filtex=[], regex=False):
+    def to_textgrid(self, filtin=[], filtex=[], regex=False, overlap='drop',
+                    report=False):
         """Convert the object to a :class:`pympi.Praat.TextGrid` object.
 
+        Praat tiers can't contain overlapping intervals so annotations that
+        overlap with an earlier annotation in the same tier are resolved
+        according to ``overlap``:
+
+        - ``'drop'``: the annotation is left out.
+        - ``'clip'``: the start of the annotation is moved to the end of the
+          earlier annotation, when nothing remains it is left out.
+        - ``'split'``: the annotation is moved to an extra tier called
+          ``{tier}_overlap1``, ``{tier}_overlap2``, etc. Numbers that would
+          give the name of an existing tier are skipped.
+
+        Annotations on unaligned timeslots are always left out.
+
         :param list filtin: Include only tiers in this list, if empty
             all tiers are included.
         :param list filtex: Exclude all tiers in this list.
         :param bool regex: If this flag is set the filters are seen as regexes.
-        :returns: :class:`pympi.Praat.TextGrid` representation.
+        :param str overlap: Policy for overlapping annotations, one of
+            ``'drop'``, ``'clip'`` or ``'split'``.
+        :param bool report: Flag to also return the number of dropped and
+            altered (clipped or moved) annotations per tier.
+        :returns: :class:`pympi.Praat.TextGrid` representation or, when
+            ``report`` is set, a tuple of the TextGrid and a dictionary of the
+            form: ``{tier_name -> (dropped, altered)}``.
         :raises ImportError: If the pympi.Praat module can't be loaded.
+        :raises ValueError: If the overlap policy is unknown.
         """
         from pympi.Praat import TextGrid
+        if overlap not in ('drop', 'clip', 'split'):
+            raise ValueError('Unknown overlap policy: {}'.format(overlap))
         _, end = self.get_full_time_interval()
         tgout = TextGrid(xmax=end/1000.0)
-        func = (lambda x, y: re.match(x, y)) if regex else lambda x, y: x == y
+        filt = AnnotationFilter(filtin, filtex, regex)
+        counts = {}
         for tier in self.tiers:
-            if (filtin and not any(func(f, tier) for f in filtin)) or\
-                    (filtex and any(func(f, tier) for f in filtex)):
+            if not filt.match(tier):
                 continue
             ctier = tgout.add_tier(tier)
-            for intv in self.get_annotation_data_for_tier(tier):
-                try:
-                    ctier.add_interval(intv[0]/1000.0, intv[1]/1000.0, intv[2])
-                except:
-                    pass
-        return tgout
+            layers = [[]]
+            ends = [0]
+            anns = self.get_annotation_data_for_tier(tier)
+            # Annotations on unaligned timeslots can't be converted
+            aligned = sorted(a for a in anns
+                             if a[0] is not None and a[1] is not None)
+            dropped, altered = len(anns) - len(aligned), 0
+            for begin, end, value, *_ in aligned:
+                if begin >= ends[0]:
+                    layer = 0
+                elif overlap == 'clip' and end > ends[0]:
+                    begin, layer = ends[0], 0
+                    altered += 1
+                elif overlap == 'split':
+                    layer = next((i for i, e in enumerate(ends) if begin >= e),
+                                 len(ends))
+                    if layer == len(ends):
+                        layers.append([])
+                        ends.append(0)
+                    altered += 1
+                else:
+                    dropped += 1
+                    continue
+                layers[layer].append((begin/1000.0, end/1000.0, value))
+                ends[layer] = end
+            ctier.add_intervals(layers[0], check=False)
+            n = 0
+            for intervals in layers[1:]:
+                n += 1
+                while '{}_overlap{}'.format(tier, n) in self.tiers:
+                    n += 1
+                tgout.add_tier('{}_overlap{}'.format(tier, n)).add_intervals(
+                    intervals, check=False)
+            counts[tier] = (dropped, altered)
+        return (tgout, counts) if report else tgout
+
+    def validate(self, schema=None):
+        """Validate the object. The references between annotations,
+        timeslots, tiers and linguistic types are always checked, see
+        :func:`validate_references`. Optionally the document is also
+        validated against the XSD of its version.
+
+        :param bool schema: Flag to validate against the XSD, this requires
+            lxml. If ``None`` the XSD is used when lxml is installed and there
+            is one for the version, see :func:`get_schema`.
+        :returns: List of the problems found, empty if the object is valid.
+        :raises ImportError: If the XSD is requested but lxml is not
+            installed.
+        :raises ValueError: If the XSD is requested but there is none for the
+            version.
+        """
+        errors = self.validate_references()
+        if schema or schema is None and lxml_etree is not None:
+            if schema or self.adocument['VERSION'] in SCHEMA_FILES:
+                errors.extend(schema_errors(to_adocument(self, False, 'lxml')))
+            else:
+                warnings.warn('No schema for this version of the ELAN spec... '
+                              'Only the references are validated...')
+        return errors
+
+    def validate_references(self):
+        """Check that everything the tiers and annotations refer to exists,
+        this only uses the dictionaries and doesn't need any dependencies.
+
+        :returns: List of the problems found, empty if all references are
+            valid.
+        """
+        errors = []
+        for tier, (aligned, ref, attrib, _) in self.tiers.items():
+            if attrib.get('LINGUISTIC_TYPE_REF') not in self.linguistic_types:
+                errors.append('Tier {} refers to unknown linguistic type {}'
+                              .format(tier, attrib.get('LINGUISTIC_TYPE_REF')))
+            parent = attrib.get('PARENT_REF')
+            if parent is not None and parent not in self.tiers:
+                errors.append('Tier {} refers to unknown parent tier {}'
+                              .format(tier, parent))
+            for aid, (begin, end, _, _) in aligned.items():
+                for ts in (begin, end):
+                    if ts not in self.timeslots:
+                        errors.append('Annotation {} in tier {} refers to '
+                                      'unknown time slot {}'.format(
+                                          aid, tier, ts))
+            for aid, (parent, _, prev, _) in ref.items():
+                if parent not in self.annotations:
+                    errors.append('Annotation {} in tier {} refers to unknown '
+                                  'annotation {}'.format(aid, tier, parent))
+                if prev is not None and prev not in self.annotations:
+                    errors.append('Annotation {} in tier {} refers to unknown '
+                                  'previous annotation {}'.format(
+                                      aid, tier, prev))
+            for aid in itertools.chain(aligned, ref):
+                if self.annotations.get(aid) != tier:
+                    errors.append('Annotation {} in tier {} is indexed in tier'
+                                  ' {}'.format(aid, tier,
+                                               self.annotations.get(aid)))
+        return errors
+
+
+class AnnotationFilter:
+    """Compiled inclusive and/or exclusive filter on annotation values or tier
+    names. A filter can be reused for many tiers and files.
+
+    When the filters are regular expressions they match the start of the
+    string like :func:`re.match`, otherwise the strings should match exactly.
+    Regular expressions without groups are combined in one alternation.
+    """
+    def __init__(self, filtin=None, filtex=None, regex=False):
+        """Construct a filter.
+
+        :param list filtin: List of strings to be included, if None all
+            strings are included.
+        :param list filtex: List of strings to be excluded, if None no strings
+            are excluded.
+        :param bool regex: If this flag is set, the filters are seen as regex
+            matches.
+        :raises re.error: If one of the regexes is invalid.
+        """
+        self.regex = regex
+        self.filtin = self._compile(filtin) if filtin else None
+        self.filtex = self._compile(filtex) if filtex else None
+
+    def _compile(self, filters):
+        if not self.regex:
+            return frozenset(filters).__contains__
+        patterns = [re.compile(f) for f in filters]
+        # Combining renumbers the groups so backreferences would break and
+        # flags of one pattern would apply to all of them
+        if all(not p.groups and p.flags == re.UNICODE for p in patterns):
+            return re.compile('|'.join(
+                '(?:{})'.format(p.pattern) for p in patterns)).match
+        return lambda x: any(p.match(x) for p in patterns)
+
+    def match(self, value):
+        """Check whether a string passes the filter.
+
+        :param str value: Annotation value or tier name.
+        :returns: ``True`` if the string is included and not excluded.
+        """
+        return (self.filtin is None or bool(self.filtin(value))) and\
+            (self.filtex is None or not self.filtex(value))
 
 
 def eaf_from_chat(file_path, codec=None, extension='wav'):
@@ -1428,6 +2143,9 @@ def eaf_from_chat(file_path, codec=None, extension='wav'):
     Eaf file will be added there too. The file description of chat files can be
     found `here <https://talkbank.org/manuals/CHAT.pdf>`_.
 
+    The file is read as a stream, see :func:`iter_chat_lines`, and dependent
+    tiers are attached directly to the last main tier annotation.
+
     :param str file_path: The file path of the .cha file.
     :param str codec: The codec, if the @UTF8 header is present it will choose
         utf-8, default is ascii. Older CHAT files don't have their encoding
@@ -1443,28 +2161,9 @@ def eaf_from_chat(file_path, codec=None, extension='wav'):
         'child', constraints='Symbolic_Association', timealignable=False)
     participantsdb = {}
     last_annotation = None
-    # attempt to resolve the file codec
-    if codec is None:
-        codec = 'latin-1'
-        with open(file_path, 'r', encoding=codec) as chatin:
-            if '@UTF8' == chatin.readline().strip():
-                codec = 'utf8'
-    # Read the whole file into memory. Sometimes lines are continued into the
-    # next line which begins with whitespace. In that case, we attempt to concat
-    # the continued line with the previous.
-    lines = []
-    line_prefixes = ('@', '%', '*')
-    with open(file_path, 'r', encoding=codec) as chatin:
-        for line in chatin:
-            line = line.strip()
-            if line.startswith(line_prefixes):
-                lines.append(line)
-            elif lines:
-                lines[-1] = " ".join((lines[-1], line.strip()))
-            else:
-                lines.append(line)
+    last_aid = None
     end_flag = False
-    for line in lines:
+    for line in iter_chat_lines(file_path, codec):
         if line == '@UTF8':  # Codec marker
             continue
         elif line == '@Begin':
@@ -1500,30 +2199,29 @@ def eaf_from_chat(file_path, codec=None, extension='wav'):
                 for tier in eafob.get_tier_names():
                     eafob.tiers[tier][2]['ANNOTATOR'] = value
         elif line.startswith('*'):  # Main tier marker
-            for participant in participantsdb.keys():
-                if line.startswith('*{}:'.format(participant)):
-                    splits = ''.join(line.split(':')[1:]).strip()
-                    # Check if the main tier contains timestamps. If it does not
-                    # fallback to the previous annotation or insert a dummy time
-                    if len(splits.split('\x15')) == 3:
-                        utt, time, _ = splits.split('\x15')
-                        time = [int(part) for part in time.split('_')]
+            participant = line[1:].split(':', 1)[0]
+            if participant in participantsdb:
+                splits = ''.join(line.split(':')[1:]).strip()
+                # Check if the main tier contains timestamps. If it does not
+                # fallback to the previous annotation or insert a dummy time
+                if len(splits.split('\x15')) == 3:
+                    utt, time, _ = splits.split('\x15')
+                    time = [int(part) for part in time.split('_')]
+                else:
+                    utt = splits
+                    if last_annotation is not None:
+                        time = last_annotation[1], last_annotation[2]
                     else:
-                        utt = splits
-                        if last_annotation is not None:
-                            time = last_annotation[1], last_annotation[2]
-                        else:
-                            time = [0, 1] # fallback annotation
-                    last_annotation = (participant, time[0], time[1], utt)
-                    eafob.add_annotation(*last_annotation)
+                        time = [0, 1] # fallback annotation
+                last_annotation = (participant, time[0], time[1], utt)
+                last_aid = eafob.add_annotation(*last_annotation)
         elif line.startswith('%'):  # Dependant tier marker
             splits = line.split(':')
             name = '{}_{}'.format(last_annotation[0], splits[0][1:])
             if name not in eafob.get_tier_names():
                 eafob.add_tier(name, 'child', last_annotation[0])
-            eafob.add_ref_annotation(
-                name, last_annotation[0], sum(last_annotation[1:3])/2,
-                ''.join(splits[1:]).strip())
+            eafob.add_ref_annotation_by_id(
+                name, last_aid, ''.join(splits[1:]).strip())
         else:
             warnings.warn('Unable to parse line of chat file: {}'.format(line))
     if not end_flag:
@@ -1531,21 +2229,209 @@ def eaf_from_chat(file_path, codec=None, extension='wav'):
     return eafob
 
 
-def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
+def eafs_from_chat(file_paths, codec=None, extension='wav'):
+    """Convert a corpus of .cha files to elan objects one file at a time, see
+    :func:`eaf_from_chat`. Files without a @End header are skipped with a
+    warning.
+
+    :param file_paths: Paths of the .cha files, or a single directory that is
+        searched recursively for .cha files.
+    :type file_paths: list or str
+    :param str codec: The codec, if ``None`` it is detected per file.
+    :param str extension: The extension of the media files.
+    :yields: Tuples of the form ``(file_path, eaf_obj)``.
+    """
+    if isinstance(file_paths, (str, pathlib.Path)):
+        file_paths = sorted(pathlib.Path(file_paths).rglob('*.cha'))
+    for file_path in file_paths:
+        try:
+            yield file_path, eaf_from_chat(file_path, codec, extension)
+        except StopIteration:
+            warnings.warn('Skipping chat file without @End header: {}'.format(
+                file_path))
+
+
+def iter_chat_lines(file_path, codec=None):
+    """Read the lines of a .cha file as a stream. Lines that are continued on
+    the next line, which then begins with whitespace, are joined.
+
+    :param str file_path: The file path of the .cha file.
+    :param str codec: The codec, if ``None`` it will be utf-8 when the first
+        line is the @UTF8 header and latin-1 otherwise.
+    :yields: The stripped and joined lines.
+    """
+    line_prefixes = ('@', '%', '*')
+    with open(file_path, 'rb') as chatin:
+        if codec is None:
+            codec = 'utf8' if chatin.readline().strip() == b'@UTF8' else\
+                'latin-1'
+            chatin.seek(0)
+        current = None
+        for line in io.TextIOWrapper(chatin, encoding=codec):
+            line = line.strip()
+            if current is not None and not line.startswith(line_prefixes):
+                current = ' '.join((current, line))
+                continue
+            if current is not None:
+                yield current
+            current = line
+        if current is not None:
+            yield current
+
+
+ID_NUMBER = re.compile(r'\d+$')
+
+
+def id_number(identifier):
+    """Give the numeric suffix of an annotation or timeslot id, this function
+    is mainly used internally to keep track of the highest id.
+
+    :param str identifier: Id to parse, e.g. ``a12`` or ``ts3``.
+    :returns: The numeric suffix or ``0`` if there is none.
+    """
+    match = ID_NUMBER.search(identifier)
+    return int(match.group()) if match else 0
+
+
+XSI = 'http://www.w3.org/2001/XMLSchema-instance'
+
+
+def get_xml_backend(backend=None):
+    """Give the module used for reading and writing xml.
+
+    :param str backend: Name of the backend, ``'lxml'`` for `lxml`_ or
+        ``'etree'`` for :mod:`xml.etree.ElementTree`. If ``None`` ElementTree
+        is used, also when lxml is installed, so the output doesn't depend on
+        the installed packages. lxml is faster but its output is not byte
+        identical, it closes empty elements with ``/>`` instead of ``" />"``
+        and orders the namespace attributes differently. Files written with
+        either backend are read back as the same object.
+    :returns: The etree module of the backend.
+    :raises ImportError: If lxml is requested but not installed.
+    :raises ValueError: If the backend is unknown.
+
+    .. _lxml: https://lxml.de/
+    """
+    if backend is None or backend == 'etree':
+        return etree
+    elif backend == 'lxml':
+        if lxml_etree is None:
+            raise ImportError('lxml is not installed...')
+        return lxml_etree
+    raise ValueError('Unknown xml backend: {}'.format(backend))
+
+
+SCHEMA_DIR = pathlib.Path(__file__).resolve().parent / 'schemas'
+# XSD for every version of the EAF format, used both when parsing and when
+# validating an object
+SCHEMA_FILES = {'2.8': 'EAFv2.8.xsd', '3.0': 'EAFv3.0.xsd'}
+_schemas = {}
+
+
+def get_schema(version):
+    """Give the compiled XSD for an EAF version, every XSD is only compiled
+    once.
+
+    :param str version: Version of the EAF format.
+    :returns: The :class:`lxml.etree.XMLSchema`.
+    :raises ImportError: If lxml is not installed.
+    :raises ValueError: If there is no XSD for the version.
+    """
+    if lxml_etree is None:
+        raise ImportError('lxml is needed for schema validation...')
+    if version not in SCHEMA_FILES:
+        raise ValueError('No schema for EAF version {}...'.format(version))
+    name = SCHEMA_FILES[version]
+    if name not in _schemas:
+        _schemas[name] = lxml_etree.XMLSchema(
+            lxml_etree.parse(str(SCHEMA_DIR / name)))
+    return _schemas[name]
+
+
+def schema_errors(root, version=None):
+    """Validate an annotation document against the XSD of its version.
+
+    :param lxml.etree.Element root: The annotation document element.
+    :param str version: Version of the XSD, if ``None`` the version of the
+        document is used.
+    :returns: List of the problems found, empty if the document is valid.
+    :raises ImportError: If lxml is not installed.
+    :raises ValueError: If there is no XSD for the version.
+    """
+    schema = get_schema(version or root.get('VERSION'))
+    if schema.validate(root):
+        return []
+    return ['Line {}: {}'.format(e.line, e.message) for e in schema.error_log]
+
+
+def iter_adocument(file_path, backend=None):
+    """Read an annotation document incrementally. First the root element is
+    given, after that every child of the root once it is complete. The
+    children are detached from the tree after they are given so the whole
+    document is never kept in memory.
+
+    :param str file_path: Path or binary file object to read from.
+    :param str backend: Xml backend, see :func:`get_xml_backend`.
+    :yields: The root element and then the children of the root.
+    :raises Exception: If the document is not valid xml.
+    """
+    xml = get_xml_backend(backend)
+    if not hasattr(file_path, 'read'):
+        file_path = str(file_path)
+    depth = 0
+    try:
+        for event, elem in xml.iterparse(file_path, events=('start', 'end')):
+            if event == 'start':
+                if depth == 0:
+                    root = elem
+                    yield root
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 1:
+                    yield elem
+                    root.remove(elem)
+    except xml.ParseError:
+        raise Exception('Unable to parse eaf, can you open it in ELAN?')
+
+
+def parse_eaf(file_path, eaf_obj, suppress_version_warning=False,
+              backend=None, validate=False):
     """Parse an EAF file
 
     :param str file_path: Path to read from, - for stdin.
     :param pympi.Elan.Eaf eaf_obj: Existing EAF object to put the data in.
+    :param str backend: Xml backend, see :func:`get_xml_backend`.
+    :param bool validate: Flag to validate the file. When lxml is installed
+        the file is parsed with lxml and validated against the XSD of its
+        version before loading, when there is one. The references are checked
+        after loading with every backend.
     :returns: EAF object.
+    :raises ValueError: If the file is not valid.
     """
     if file_path == '-':
-        file_path = sys.stdin
+        file_path = sys.stdin.buffer
+    xml = get_xml_backend(backend)
     # Annotation document
-    try:
-        # py3.5 compat: etree.parse does not support pathlib.Path objects in py3.5.
-        tree_root = etree.parse(str(file_path)).getroot()
-    except etree.ParseError:
-        raise Exception('Unable to parse eaf, can you open it in ELAN?')
+    if validate and lxml_etree is not None:
+        xml = lxml_etree
+        # The whole tree is needed for the XSD so it is not read incrementally
+        try:
+            tree_root = xml.parse(file_path if hasattr(file_path, 'read')
+                                  else str(file_path)).getroot()
+        except xml.ParseError:
+            raise Exception('Unable to parse eaf, can you open it in ELAN?')
+        if tree_root.get('VERSION') in SCHEMA_FILES:
+            errors = schema_errors(tree_root)
+            if errors:
+                raise ValueError('Invalid eaf file:\n' + '\n'.join(errors))
+        else:
+            warnings.warn('No schema for this version of the ELAN spec... '
+                          'Only the references are validated...')
+        elements = iter(tree_root)
+    else:
+        elements = iter_adocument(file_path, backend)
+        tree_root = next(elements)
 
     if not suppress_version_warning and \
             tree_root.attrib['VERSION'] not in ['3.0', '2.8', '2.7']:
@@ -1555,7 +2441,7 @@ def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
     del(eaf_obj.adocument['{http://www.w3.org/2001/XMLSchema-instance}noNamesp'
                           'aceSchemaLocation'])
     tier_number = 0
-    for elem in tree_root:
+    for elem in elements:
         # Licence
         if elem.tag == 'LICENSE':
             eaf_obj.licenses.append((elem.text, elem.attrib['LICENSE_URL']))
@@ -1564,9 +2450,10 @@ def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
             eaf_obj.header.update(elem.attrib)
             for elem1 in elem:
                 if elem1.tag == 'MEDIA_DESCRIPTOR':
-                    eaf_obj.media_descriptors.append(elem1.attrib)
+                    eaf_obj.media_descriptors.append(dict(elem1.attrib))
                 elif elem1.tag == 'LINKED_FILE_DESCRIPTOR':
-                    eaf_obj.linked_file_descriptors.append(elem1.attrib)
+                    eaf_obj.linked_file_descriptors.append(
+                        dict(elem1.attrib))
                 elif elem1.tag == 'PROPERTY':
                     eaf_obj.properties.append(
                         (elem1.attrib['NAME'], elem1.text))
@@ -1574,8 +2461,8 @@ def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
         elif elem.tag == 'TIME_ORDER':
             for elem1 in elem:
                 tsid = elem1.attrib['TIME_SLOT_ID']
-                tsnum = int(''.join(filter(str.isdigit, tsid)))
-                if tsnum and tsnum > eaf_obj.maxts:
+                tsnum = id_number(tsid)
+                if tsnum > eaf_obj.maxts:
                     eaf_obj.maxts = tsnum
                 ts = elem1.attrib.get('TIME_VALUE', None)
                 eaf_obj.timeslots[tsid] = ts if ts is None else int(ts)
@@ -1589,9 +2476,8 @@ def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
                     for elem2 in elem1:
                         if elem2.tag == 'ALIGNABLE_ANNOTATION':
                             annot_id = elem2.attrib['ANNOTATION_ID']
-                            annot_num = int(''.join(
-                                filter(str.isdigit, annot_id)))
-                            if annot_num and annot_num > eaf_obj.maxaid:
+                            annot_num = id_number(annot_id)
+                            if annot_num > eaf_obj.maxaid:
                                 eaf_obj.maxaid = annot_num
                             annot_start = elem2.attrib['TIME_SLOT_REF1']
                             annot_end = elem2.attrib['TIME_SLOT_REF2']
@@ -1606,9 +2492,8 @@ def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
                             previous = elem2.attrib.get('PREVIOUS_ANNOTATION',
                                                         None)
                             annot_id = elem2.attrib['ANNOTATION_ID']
-                            annot_num = int(''.join(
-                                filter(str.isdigit, annot_id)))
-                            if annot_num and annot_num > eaf_obj.maxaid:
+                            annot_num = id_number(annot_id)
+                            if annot_num > eaf_obj.maxaid:
                                 eaf_obj.maxaid = annot_num
                             svg_ref = elem2.attrib.get('SVG_REF', None)
                             ref[annot_id] = (annot_ref,
@@ -1616,12 +2501,16 @@ def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
                                              list(elem2)[0].text,
                                              previous, svg_ref)
                             eaf_obj.annotations[annot_id] = tier_id
-            eaf_obj.tiers[tier_id] = (align, ref, elem.attrib, tier_number)
+            if tier_id in eaf_obj.tiers:
+                eaf_obj._unindex_tier(tier_id)
+            eaf_obj.tiers[tier_id] = (align, ref, dict(elem.attrib),
+                                      tier_number)
+            eaf_obj._index_tier(tier_id)
             tier_number += 1
         # Linguistic type
         elif elem.tag == 'LINGUISTIC_TYPE':
             eaf_obj.linguistic_types[elem.attrib['LINGUISTIC_TYPE_ID']] =\
-                elem.attrib
+                dict(elem.attrib)
         # Locale
         elif elem.tag == 'LOCALE':
             eaf_obj.locales[elem.attrib['LANGUAGE_CODE']] =\
@@ -1670,156 +2559,256 @@ def parse_eaf(file_path, eaf_obj, suppress_version_warning=False):
                 (descriptions, entries, ext_ref)
         # Lexicon ref
         elif elem.tag == 'LEXICON_REF':
-            eaf_obj.lexicon_refs[elem.attrib['LEX_REF_ID']] = elem.attrib
+            eaf_obj.lexicon_refs[elem.attrib['LEX_REF_ID']] =\
+                dict(elem.attrib)
         # External ref
         elif elem.tag == 'EXTERNAL_REF':
             eaf_obj.external_refs[elem.attrib['EXT_REF_ID']] = (
                 elem.attrib['TYPE'], elem.attrib['VALUE'])
+    eaf_obj.invalidate_time_intervals()
+    if validate:
+        errors = eaf_obj.validate_references()
+        if errors:
+            raise ValueError('Invalid eaf file:\n' + '\n'.join(errors))
 
 
 def indent(el, level=0):
     """Function to pretty print the xml, meaning adding tabs and newlines.
+    The tree is walked with an explicit stack so deep trees don't hit the
+    recursion limit.
 
     :param ElementTree.Element el: Current element.
     :param int level: Current level.
     """
-    i = '\n' + level * '\t'
-    if len(el):
-        if not el.text or not el.text.strip():
-            el.text = i+'\t'
-        if not el.tail or not el.tail.strip():
-            el.tail = i
-        for elem in el:
-            indent(elem, level+1)
-        if not el.tail or not el.tail.strip():
-            el.tail = i
-    else:
-        if level and (not el.tail or not el.tail.strip()):
-            el.tail = i
-
-
-def to_adocument(eaf_obj, pretty=True):
+    # Indentation strings per level, created once per level instead of once
+    # per element
+    indents = []
+    stack = [(el, level)]
+    while stack:
+        el, level = stack.pop()
+        while len(indents) <= level + 1:
+            indents.append('\n' + len(indents) * '\t')
+        tail = el.tail
+        if len(el):
+            text = el.text
+            if not text or not text.strip():
+                el.text = indents[level + 1]
+            if not tail or not tail.strip():
+                el.tail = indents[level]
+            stack.extend((child, level + 1) for child in el)
+        elif level and (not tail or not tail.strip()):
+            el.tail = indents[level]
+
+
+def to_adocument(eaf_obj, pretty=True, backend=None):
     """Create an etree Element from an Eaf object
 
     :param pympi.Elan.Eaf eaf_obj: Object to write.
     :param bool pretty: Flag to set pretty printing.
+    :param str backend: Xml backend, see :func:`get_xml_backend`.
     :return: etree.Element: the etree Element containing the Annotation Document
     """
+    xml = get_xml_backend(backend)
+    attrib, nsmap = adocument_attributes(eaf_obj, xml)
+    if nsmap is None:
+        ADOCUMENT = xml.Element('ANNOTATION_DOCUMENT', attrib)
+    else:
+        ADOCUMENT = xml.Element('ANNOTATION_DOCUMENT', attrib, nsmap=nsmap)
+    ADOCUMENT.extend(iter_adocument_elements(eaf_obj, xml))
+
+    if pretty:
+        indent(ADOCUMENT)
+
+    return ADOCUMENT
+
+
+def adocument_attributes(eaf_obj, xml=etree):
+    """Give the attributes of the annotation document element. lxml doesn't
+    allow namespace prefixes in attribute names so for lxml the namespaces are
+    put in a separate namespace map.
+
+    :param pympi.Elan.Eaf eaf_obj: Object to write.
+    :param module xml: Etree module of the xml backend.
+    :returns: Tuple of the form ``(attributes, nsmap)``, ``nsmap`` is ``None``
+        for :mod:`xml.etree.ElementTree`.
+    """
+    if xml is not lxml_etree:
+        return eaf_obj.adocument, None
+    nsmap = {k[6:]: v for k, v in eaf_obj.adocument.items()
+             if k.startswith('xmlns:')}
+    attrib = {}
+    for k, v in eaf_obj.adocument.items():
+        prefix, _, name = k.rpartition(':')
+        if prefix == 'xmlns':
+            continue
+        elif prefix:
+            nsmap.setdefault(prefix, XSI)
+            k = '{{{}}}{}'.format(nsmap[prefix], name)
+        attrib[k] = v
+    return attrib, nsmap
+
+
+def iter_adocument_elements(eaf_obj, xml=etree):
+    """Create the children of the annotation document element one by one,
+    this allows the document to be written without building the whole tree.
+
+    :param pympi.Elan.Eaf eaf_obj: Object to write.
+    :param module xml: Etree module of the xml backend.
+    :yields: The children of the annotation document in order.
+    """
     def rm_none(x):
         return {k: v if isinstance(v, str) else str(v) for k, v in x.items()
                 if v is not None}
-    # Annotation Document
-    ADOCUMENT = etree.Element('ANNOTATION_DOCUMENT', eaf_obj.adocument)
+
+    def ts_key(ts):
+        # Slicing suffices for the ids generated by pympi and ELAN
+        num = ts[2:]
+        return (int(num) if ts[:2] == 'ts' and num.isdigit() else
+                id_number(ts), ts)
+    Element = xml.Element
+    SubElement = xml.SubElement
     # Licence
     for m in eaf_obj.licenses:
-        n = etree.SubElement(ADOCUMENT, 'LICENSE', {'LICENSE_URL': m[1]})
+        n = Element('LICENSE', {'LICENSE_URL': m[1]})
         n.text = m[0]
+        yield n
     # Header
-    HEADER = etree.SubElement(ADOCUMENT, 'HEADER', eaf_obj.header)
+    HEADER = Element('HEADER', rm_none(eaf_obj.header))
     # Media descriptiors
     for m in eaf_obj.media_descriptors:
-        etree.SubElement(HEADER, 'MEDIA_DESCRIPTOR', rm_none(m))
+        SubElement(HEADER, 'MEDIA_DESCRIPTOR', rm_none(m))
     # Linked file descriptors
     for m in eaf_obj.linked_file_descriptors:
-        etree.SubElement(HEADER, 'LINKED_FILE_DESCRIPTOR', rm_none(m))
+        SubElement(HEADER, 'LINKED_FILE_DESCRIPTOR', rm_none(m))
     # Properties
     for k, v in eaf_obj.properties:
-        etree.SubElement(HEADER, 'PROPERTY', {'NAME': k}).text = str(v)
+        SubElement(HEADER, 'PROPERTY', {'NAME': k}).text = str(v)
+    yield HEADER
+    # The loops below are the bulk of the work, they build the attributes
+    # directly instead of filtering them with rm_none. Attributes without a
+    # value are left out, just like rm_none does.
     # Time order
-    TIME_ORDER = etree.SubElement(ADOCUMENT, 'TIME_ORDER')
-    for t in sorted(
-        eaf_obj.timeslots.items(),
-        key=lambda x: (int(re.findall(r"ts(\d+)", x[0])[0]), x[0]),
-    ):
-        etree.SubElement(TIME_ORDER, 'TIME_SLOT', rm_none(
-            {'TIME_SLOT_ID': t[0], 'TIME_VALUE': t[1]}))
+    TIME_ORDER = Element('TIME_ORDER')
+    for tsid in sorted(eaf_obj.timeslots, key=ts_key):
+        value = eaf_obj.timeslots[tsid]
+        if value is None:
+            SubElement(TIME_ORDER, 'TIME_SLOT', {'TIME_SLOT_ID': tsid})
+        else:
+            SubElement(TIME_ORDER, 'TIME_SLOT', {
+                'TIME_SLOT_ID': tsid, 'TIME_VALUE': str(value)})
+    yield TIME_ORDER
     # Tiers
     for t in sorted(eaf_obj.tiers.items(), key=lambda x: x[1][3]):
-        tier = etree.SubElement(ADOCUMENT, 'TIER', rm_none(t[1][2]))
-        for a in t[1][0].items():
-            ann = etree.SubElement(tier, 'ANNOTATION')
-            alan = etree.SubElement(ann, 'ALIGNABLE_ANNOTATION', rm_none(
-                {'ANNOTATION_ID': a[0], 'TIME_SLOT_REF1': a[1][0],
-                 'TIME_SLOT_REF2': a[1][1], 'SVG_REF': a[1][3]}))
-            etree.SubElement(alan, 'ANNOTATION_VALUE').text = a[1][2]
-        for a in t[1][1].items():
-            ann = etree.SubElement(tier, 'ANNOTATION')
-            rean = etree.SubElement(ann, 'REF_ANNOTATION', rm_none(
-                {'ANNOTATION_ID': a[0], 'ANNOTATION_REF': a[1][0],
-                 'PREVIOUS_ANNOTATION': a[1][2], 'SVG_REF': a[1][3]}))
-            etree.SubElement(rean, 'ANNOTATION_VALUE').text = a[1][1]
+        tier = Element('TIER', rm_none(t[1][2]))
+        for aid, (begin, end, value, svg) in t[1][0].items():
+            attrib = {'ANNOTATION_ID': aid, 'TIME_SLOT_REF1': begin,
+                      'TIME_SLOT_REF2': end}
+            if svg is not None:
+                attrib['SVG_REF'] = svg
+            alan = SubElement(SubElement(tier, 'ANNOTATION'),
+                              'ALIGNABLE_ANNOTATION', attrib)
+            SubElement(alan, 'ANNOTATION_VALUE').text = value or None
+        for aid, (ref, value, prev, svg) in t[1][1].items():
+            attrib = {'ANNOTATION_ID': aid, 'ANNOTATION_REF': ref}
+            if prev is not None:
+                attrib['PREVIOUS_ANNOTATION'] = prev
+            if svg is not None:
+                attrib['SVG_REF'] = svg
+            rean = SubElement(SubElement(tier, 'ANNOTATION'),
+                              'REF_ANNOTATION', attrib)
+            SubElement(rean, 'ANNOTATION_VALUE').text = value or None
+        yield tier
     # Linguistic types
     for l in eaf_obj.linguistic_types.values():
-        etree.SubElement(ADOCUMENT, 'LINGUISTIC_TYPE', rm_none(l))
+        yield Element('LINGUISTIC_TYPE', rm_none(l))
     # Locales
     for lc, (cc, vr) in eaf_obj.locales.items():
-        etree.SubElement(ADOCUMENT, 'LOCALE', rm_none(
+        yield Element('LOCALE', rm_none(
             {'LANGUAGE_CODE': lc, 'COUNTRY_CODE': cc, 'VARIANT': vr}))
     # Languages
     for lid, (ldef, label) in eaf_obj.languages.items():
-        etree.SubElement(ADOCUMENT, 'LANGUAGE', rm_none(
+        yield Element('LANGUAGE', rm_none(
             {'LANG_ID': lid, 'LANG_DEF': ldef, 'LANG_LABEL': label}))
     # Constraints
     for l in eaf_obj.constraints.items():
-        etree.SubElement(ADOCUMENT, 'CONSTRAINT', rm_none(
+        yield Element('CONSTRAINT', rm_none(
             {'STEREOTYPE': l[0], 'DESCRIPTION': l[1]}))
     # Controlled vocabularies
     for cvid, (descriptions, cv_entries, ext_ref) in\
             eaf_obj.controlled_vocabularies.items():
-        cv = etree.SubElement(ADOCUMENT, 'CONTROLLED_VOCABULARY',
-                              rm_none({'CV_ID': cvid, 'EXT_REF': ext_ref}))
+        cv = Element('CONTROLLED_VOCABULARY',
+                     rm_none({'CV_ID': cvid, 'EXT_REF': ext_ref}))
         for lang_ref, description in descriptions:
-            des = etree.SubElement(cv, 'DESCRIPTION', {'LANG_REF': lang_ref})
+            des = SubElement(cv, 'DESCRIPTION', {'LANG_REF': lang_ref})
             if description:
                 des.text = description
         for cveid, (values, ext_ref) in cv_entries.items():
-            cem = etree.SubElement(cv, 'CV_ENTRY_ML', rm_none({
+            cem = SubElement(cv, 'CV_ENTRY_ML', rm_none({
                 'CVE_ID': cveid, 'EXT_REF': ext_ref}))
             for value, lang_ref, description in values:
-                val = etree.SubElement(cem, 'CVE_VALUE', rm_none({
+                val = SubElement(cem, 'CVE_VALUE', rm_none({
                     'LANG_REF': lang_ref, 'DESCRIPTION': description}))
                 val.text = value
+        yield cv
     # Lexicon refs
     for l in eaf_obj.lexicon_refs.values():
-        etree.SubElement(ADOCUMENT, 'LEXICON_REF', rm_none(l))
+        yield Element('LEXICON_REF', rm_none(l))
     # Exteral refs
     for eid, (etype, value) in eaf_obj.external_refs.items():
-        etree.SubElement(ADOCUMENT, 'EXTERNAL_REF', rm_none(
+        yield Element('EXTERNAL_REF', rm_none(
             {'EXT_REF_ID': eid, 'TYPE': etype, 'VALUE': value}))
 
-    if pretty:
-        indent(ADOCUMENT)
-
-    return ADOCUMENT
 
-def to_eaf(file_path, eaf_obj, pretty=True):
-    """Write an Eaf object to file.
+def to_eaf(file_path, eaf_obj, pretty=True, backend=None):
+    """Write an Eaf object to file. With lxml the document is written
+    incrementally, one child of the annotation document at a time. The
+    backends don't give byte identical files, see :func:`get_xml_backend`.
 
     :param str file_path: Filepath to write to, - for stdout.
     :param pympi.Elan.Eaf eaf_obj: Object to write.
     :param bool pretty: Flag to set pretty printing.
+    :param str backend: Xml backend, see :func:`get_xml_backend`.
     """
-    ADOCUMENT = to_adocument(eaf_obj, pretty)
+    xml = get_xml_backend(backend)
     if file_path == '-':
+        ADOCUMENT = to_adocument(eaf_obj, pretty, backend)
         try:
-            sys.stdout.write(etree.tostring(ADOCUMENT, encoding='unicode'))
+            sys.stdout.write(xml.tostring(ADOCUMENT, encoding='unicode'))
         except LookupError:
-            sys.stdout.write(etree.tostring(ADOCUMENT, encoding='UTF-8'))
-    else:
-        file_path = pathlib.Path(file_path)
-        if file_path.exists():
-            file_path.rename(file_path.with_suffix('.bak'))
+            sys.stdout.write(xml.tostring(ADOCUMENT, encoding='UTF-8'))
+        return
+    file_path = pathlib.Path(file_path)
+    if file_path.exists():
+        file_path.rename(file_path.with_suffix('.bak'))
+    if xml is not lxml_etree:
+        ADOCUMENT = to_adocument(eaf_obj, pretty, backend)
         etree.ElementTree(ADOCUMENT).write(
             str(file_path), xml_declaration=True, encoding='UTF-8')
-
-
-def to_string(eaf_obj, pretty=True, encoding='unicode'):
+        return
+    attrib, nsmap = adocument_attributes(eaf_obj, xml)
+    with open(str(file_path), 'wb') as f:
+        with xml.xmlfile(f, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            with xf.element('ANNOTATION_DOCUMENT', attrib, nsmap):
+                # Same whitespace as indent gives for the whole tree
+                if pretty:
+                    xf.write('\n\t')
+                for elem in iter_adocument_elements(eaf_obj, xml):
+                    if pretty:
+                        indent(elem, 1)
+                    xf.write(elem)
+        if pretty:
+            f.write(b'\n')
+
+
+def to_string(eaf_obj, pretty=True, encoding='unicode', backend=None):
     """Serialize a Eaf object to a string
 
     :param pympi.Elan.Eaf eaf_obj: Object to write.
     :param bool pretty: Flag to set pretty printing.
     :param str encoding: the character encoding of the string
+    :param str backend: Xml backend, see :func:`get_xml_backend`.
     :return: str: the serialized Annotation Document
     """
-    ADOCUMENT = to_adocument(eaf_obj, pretty)
-    return etree.tostring(ADOCUMENT, encoding=encoding)
+    ADOCUMENT = to_adocument(eaf_obj, pretty, backend)
+    return get_xml_backend(backend).tostring(ADOCUMENT, encoding=encoding)
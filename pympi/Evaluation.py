@@ -0,0 +1,272 @@
+import difflib
+import math
+import statistics
+
+from pympi._corpus import load, map_jobs
+from pympi.Intervals import get_intervals
+
+TOLERANCES = (0.01, 0.02, 0.05)
+
+
+def _edit_alignment(reference, hypothesis, band=None):
+    """Align two lists of intervals on their labels with the minimal number
+    of substitutions, insertions and deletions. Only the cells within a band
+    around the diagonal are computed, every alignment with a cost of at most
+    ``band`` lies within it so the result is minimal when there is one.
+
+    :param list reference: Intervals of the form ``[(begin, end, value)]``.
+    :param list hypothesis: Intervals of the form ``[(begin, end, value)]``.
+    :param int band: Maximal distance from the diagonal, if ``None`` the full
+        table is computed.
+    :returns: List of pairs of the form ``[(ref_interval, hyp_interval)]``
+        where a missing interval is ``None``.
+    """
+    n, m = len(reference), len(hypothesis)
+    band = max(n, m) if band is None else max(band, abs(n - m))
+    infinity = n + m + 1
+    # One row of distances and per row the moves within the band with the
+    # column they start at, 0 is a match or substitution, 1 a deletion and 2
+    # an insertion
+    row = [j if j <= band else infinity for j in range(m + 1)]
+    moves = [(0, bytearray([2]) * (min(m, band) + 1))]
+    for i in range(1, n + 1):
+        previous, row = row, [infinity] * (m + 1)
+        low, high = max(0, i - band), min(m, i + band)
+        move = bytearray(high - low + 1)
+        if not low:
+            row[0], move[0] = i, 1
+        label = reference[i - 1][2]
+        for j in range(max(low, 1), high + 1):
+            cost = previous[j - 1] + (label != hypothesis[j - 1][2])
+            if previous[j] + 1 < cost:
+                cost, move[j - low] = previous[j] + 1, 1
+            if row[j - 1] + 1 < cost:
+                cost, move[j - low] = row[j - 1] + 1, 2
+            row[j] = cost
+        moves.append((low, move))
+    pairs = []
+    i, j = n, m
+    while i or j:
+        low, move = moves[i]
+        move = move[j - low]
+        if move == 0:
+            i, j = i - 1, j - 1
+            pairs.append((reference[i], hypothesis[j]))
+        elif move == 1:
+            i -= 1
+            pairs.append((reference[i], None))
+        else:
+            j -= 1
+            pairs.append((None, hypothesis[j]))
+    return pairs[::-1]
+
+
+def align_labels(reference, hypothesis, context=3):
+    """Align two versions of a tier on their label sequences with the minimal
+    edit distance. Runs of equal labels are found first with
+    :class:`difflib.SequenceMatcher` on sequences of ``context`` consecutive
+    labels, which are far more distinctive than single labels. The anchors
+    are not trusted, with repeated labels they can be off, they only give an
+    upper bound of the edit distance. That bound limits the band of the edit
+    distance table so long and mostly equal tiers, like two forced
+    alignments of the same transcript, stay close to linear.
+
+    :param list reference: Intervals of the form ``[(begin, end, value)]``,
+        see :func:`pympi.Intervals.get_intervals`.
+    :param list hypothesis: Intervals of the form ``[(begin, end, value)]``.
+    :param int context: Number of consecutive labels used for the anchors.
+    :returns: List of pairs of the form ``[(ref_interval, hyp_interval)]`` in
+        order where a deleted or inserted interval is paired with ``None``.
+    """
+    def grams(intervals):
+        labels = [i[2] for i in intervals]
+        return [tuple(labels[k:k+context])
+                for k in range(len(labels) - context + 1)]
+    matcher = difflib.SequenceMatcher(
+        None, grams(reference), grams(hypothesis), autojunk=False)
+    # The cost of matching the anchors and pairing up the rest in between
+    bound = 0
+    i = j = 0
+    for a, b, size in matcher.get_matching_blocks():
+        # A block of grams covers context - 1 more labels, the part that
+        # overlaps with the previous block is skipped
+        skip = max(i - a, j - b, 0)
+        length = size + context - 1 - skip if size else 0
+        if length <= 0:
+            continue
+        a, b = a + skip, b + skip
+        bound += max(a - i, b - j)
+        i, j = a + length, b + length
+    bound += max(len(reference) - i, len(hypothesis) - j)
+    return _edit_alignment(reference, hypothesis, bound)
+
+
+def compare_tiers(reference, hypothesis):
+    """Compare two versions of a tier, the boundary offsets of the aligned
+    intervals with equal labels are grouped per label. This is the raw data
+    that :func:`summarize` turns into statistics, raw data of several files
+    can be merged with :func:`merge_comparisons`.
+
+    :param list reference: Intervals of the form ``[(begin, end, value)]``,
+        see :func:`pympi.Intervals.get_intervals`.
+    :param list hypothesis: Intervals of the form ``[(begin, end, value)]``.
+    :returns: Dictionary with the keys ``'matches'``, ``'substitutions'``,
+        ``'deletions'`` and ``'insertions'`` holding the counts and
+        ``'offsets'`` of the form ``{label -> [offset]}`` where every offset is
+        the hypothesis boundary minus the reference boundary, two per
+        interval.
+    """
+    result = {'matches': 0, 'substitutions': 0, 'deletions': 0,
+              'insertions': 0, 'offsets': {}}
+    for ref, hyp in align_labels(reference, hypothesis):
+        if hyp is None:
+            result['deletions'] += 1
+        elif ref is None:
+            result['insertions'] += 1
+        elif ref[2] != hyp[2]:
+            result['substitutions'] += 1
+        else:
+            result['matches'] += 1
+            result['offsets'].setdefault(ref[2], []).extend(
+                (hyp[0] - ref[0], hyp[1] - ref[1]))
+    return result
+
+
+def merge_comparisons(comparisons):
+    """Merge the raw comparisons of several tiers or files.
+
+    :param list comparisons: Comparisons as given by :func:`compare_tiers`.
+    :returns: A single comparison.
+    """
+    result = {'matches': 0, 'substitutions': 0, 'deletions': 0,
+              'insertions': 0, 'offsets': {}}
+    for comparison in comparisons:
+        for key in ('matches', 'substitutions', 'deletions', 'insertions'):
+            result[key] += comparison[key]
+        for label, offsets in comparison['offsets'].items():
+            result['offsets'].setdefault(label, []).extend(offsets)
+    return result
+
+
+def offset_statistics(offsets, tolerances=TOLERANCES):
+    """Give statistics of a list of boundary offsets.
+
+    :param list offsets: Signed boundary offsets.
+    :param tuple tolerances: Tolerances to compute the percentage of
+        boundaries within for.
+    :returns: Dictionary with the keys ``'count'``, ``'mean'``,
+        ``'mean_absolute'``, ``'median_absolute'``, ``'rmse'`` and
+        ``'within'`` of the form ``{tolerance -> percentage}``. The
+        statistics are ``None`` when there are no offsets.
+    """
+    if not offsets:
+        return {'count': 0, 'mean': None, 'mean_absolute': None,
+                'median_absolute': None, 'rmse': None,
+                'within': {tol: None for tol in tolerances}}
+    absolute = [abs(o) for o in offsets]
+    # Rounding keeps offsets like 1.51 - 1.5 within a tolerance of 0.01
+    rounded = [round(a, 9) for a in absolute]
+    return {
+        'count': len(offsets),
+        'mean': statistics.mean(offsets),
+        'mean_absolute': statistics.mean(absolute),
+        'median_absolute': statistics.median(absolute),
+        'rmse': math.sqrt(statistics.mean(o * o for o in offsets)),
+        'within': {tol: 100.0 * sum(1 for a in rounded if a <= tol) /
+                   len(offsets) for tol in tolerances}}
+
+
+def summarize(comparison, tolerances=TOLERANCES):
+    """Give the statistics of a raw comparison.
+
+    :param dict comparison: Comparison as given by :func:`compare_tiers` or
+        :func:`merge_comparisons`.
+    :param tuple tolerances: Tolerances for the within tolerance percentages,
+        in the unit of the intervals.
+    :returns: Dictionary with the counts of the comparison, the statistics of
+        all offsets, see :func:`offset_statistics`, in ``'boundaries'`` and
+        the statistics per label in ``'labels'``.
+    """
+    offsets = [o for label in comparison['offsets'].values() for o in label]
+    return {
+        'matches': comparison['matches'],
+        'substitutions': comparison['substitutions'],
+        'deletions': comparison['deletions'],
+        'insertions': comparison['insertions'],
+        'boundaries': offset_statistics(offsets, tolerances),
+        'labels': {label: offset_statistics(o, tolerances)
+                   for label, o in sorted(comparison['offsets'].items())}}
+
+
+def evaluate(reference, hypothesis, reference_tier=None,
+             hypothesis_tier=None, tolerances=TOLERANCES, skipempty=True):
+    """Evaluate the boundaries of a tier against a reference version of the
+    tier, for example two runs of a forced aligner. Times of Eaf objects are
+    converted to seconds so Eaf and Praat tiers can be compared.
+
+    :param reference: A :class:`pympi.Elan.Eaf`,
+        :class:`pympi.Praat.TextGrid`, :class:`pympi.Praat.Tier` or a list
+        of intervals, see :func:`pympi.Intervals.get_intervals`.
+    :param hypothesis: The version to evaluate, of the same types.
+    :param reference_tier: Name of the reference tier, or number for a
+        TextGrid.
+    :param hypothesis_tier: Name of the hypothesis tier, if ``None`` the
+        reference tier name is used.
+    :param tuple tolerances: Tolerances in seconds.
+    :param bool skipempty: Skip the intervals with an empty label.
+    :returns: Statistics, see :func:`summarize`.
+    :raises KeyError: If a tier is non existent in an Eaf.
+    :raises IndexError: If a tier is non existent in a TextGrid.
+    """
+    return summarize(_compare_sources(
+        reference, hypothesis, reference_tier, hypothesis_tier, skipempty),
+        tolerances)
+
+
+def _compare_sources(reference, hypothesis, reference_tier, hypothesis_tier,
+                     skipempty):
+    if hypothesis_tier is None:
+        hypothesis_tier = reference_tier
+    intervals = [
+        [i for i in get_intervals(source, tier, seconds=True)
+         if not skipempty or i[2].strip()]
+        for source, tier in ((reference, reference_tier),
+                             (hypothesis, hypothesis_tier))]
+    return compare_tiers(*intervals)
+
+
+def _compare_files(job):
+    """Compare one pair of files, run in the worker processes."""
+    reference, hypothesis, reference_tier, hypothesis_tier, skipempty = job
+    return _compare_sources(load(reference), load(hypothesis),
+                            reference_tier, hypothesis_tier, skipempty)
+
+
+def evaluate_corpus(file_pairs, reference_tier, hypothesis_tier=None,
+                    tolerances=TOLERANCES, skipempty=True, processes=None):
+    """Evaluate the boundaries of a tier for pairs of files in parallel, the
+    files are loaded and compared in a pool of processes. The total is
+    computed from the merged offsets of all files and not from the averages
+    per file.
+
+    :param list file_pairs: Pairs of file paths of the form
+        ``[(reference, hypothesis)]``, files ending in ``.eaf`` are read as
+        eaf files and the others as TextGrids.
+    :param reference_tier: Name of the reference tier, or number for a
+        TextGrid.
+    :param hypothesis_tier: Name of the hypothesis tier, if ``None`` the
+        reference tier name is used.
+    :param tuple tolerances: Tolerances in seconds.
+    :param bool skipempty: Skip the intervals with an empty label.
+    :param int processes: Number of processes, if ``None`` the number of
+        processors is used and if ``1`` no pool is used.
+    :returns: Tuple of the form ``(per_file, total)`` where ``per_file`` is
+        a list of statistics in the order of the pairs, see
+        :func:`summarize`.
+    :raises ValueError: If the number of processes is smaller than one.
+    """
+    comparisons = map_jobs(
+        _compare_files, [(ref, hyp, reference_tier, hypothesis_tier,
+                          skipempty) for ref, hyp in file_pairs], processes)
+    return ([summarize(c, tolerances) for c in comparisons],
+            summarize(merge_comparisons(comparisons), tolerances))
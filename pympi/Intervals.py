@@ -0,0 +1,452 @@
+import array
+import itertools
+import math
+
+from pympi.Elan import Eaf
+from pympi.Praat import TextGrid, Tier
+
+PREDICATES = {'overlap', 'contains', 'within'}
+
+
+def get_intervals(source, tier=None, seconds=False):
+    """Give the intervals of a tier sorted on their begin time, this is the
+    common format for the functions in this module. Annotations or intervals
+    without a time are left out. Points of a TextTier are given as intervals
+    of length zero.
+
+    :param source: A :class:`pympi.Elan.Eaf`, :class:`pympi.Praat.TextGrid`,
+        :class:`pympi.Praat.Tier` or a sequence of intervals of the form
+        ``[(begin, end, value)]``.
+    :param tier: Name of the tier, or number for TextGrids. Not needed for a
+        Praat tier or a sequence.
+    :param bool seconds: Flag to convert the milliseconds of an Eaf to
+        seconds, needed when combining Eaf tiers and Praat tiers.
+    :returns: List of intervals of the form ``[(begin, end, value)]``.
+    :raises KeyError: If the tier is non existent.
+    """
+    if isinstance(source, Eaf):
+        intervals = ((b, e, v) for b, e, v, *_ in
+                     source.get_annotation_data_for_tier(tier)
+                     if b is not None and e is not None)
+        if seconds:
+            intervals = ((b/1000.0, e/1000.0, v) for b, e, v in intervals)
+    else:
+        if isinstance(source, TextGrid):
+            source = source.get_tier(tier)
+        if isinstance(source, Tier):
+            if source.tier_type == 'TextTier':
+                intervals = ((p, p, v) for p, v in source.get_intervals())
+            else:
+                intervals = source.get_intervals()
+        else:
+            intervals = source
+    return sorted(intervals, key=lambda x: (x[0], x[1]))
+
+
+def interval_join(left, right, predicate='overlap', min_ratio=0):
+    """Join two lists of intervals on time. The intervals are swept once in
+    order of their begin time while only the intervals that are still running
+    are kept, this gives all pairs in ``O(n + m + k)`` time for sorted input
+    where ``k`` is the number of pairs. Unsorted input is sorted first.
+
+    Two intervals overlap when they share a positive duration, an interval of
+    length zero overlaps an interval when it lies within it, the boundaries
+    included.
+
+    The predicate selects the pairs:
+
+    - ``'overlap'``: all overlapping pairs.
+    - ``'contains'``: the left interval contains the right interval.
+    - ``'within'``: the left interval lies within the right interval.
+    - A function that gets the left interval, the right interval and the
+      overlap duration and returns a boolean.
+
+    :param list left: Intervals of the form ``[(begin, end, ...)]``, see
+        :func:`get_intervals`.
+    :param list right: Intervals of the form ``[(begin, end, ...)]``.
+    :param predicate: Name of the predicate or a function.
+    :param float min_ratio: Minimal overlap as a fraction of the duration of
+        the shorter interval of the pair, intervals of length zero always
+        satisfy this.
+    :yields: Tuples of the form ``(left_interval, right_interval, overlap)``
+        in order of the begin time of the later interval of the pair.
+    :raises ValueError: If the predicate is unknown.
+    """
+    if not callable(predicate) and predicate not in PREDICATES:
+        raise ValueError('Unknown predicate: {}'.format(predicate))
+    left = sorted(left, key=lambda x: x[0])
+    right = sorted(right, key=lambda x: x[0])
+    active = ([], [])
+    i = j = 0
+    while i < len(left) or j < len(right):
+        # Take the interval that begins first, on ties the left one
+        if j == len(right) or i < len(left) and left[i][0] <= right[j][0]:
+            side, current = 0, left[i]
+            i += 1
+        else:
+            side, current = 1, right[j]
+            j += 1
+        begin, end = current[0], current[1]
+        others = active[1 - side]
+        # Drop the intervals that ended, each interval is dropped once
+        running = []
+        for other in others:
+            if other[1] < begin:
+                continue
+            running.append(other)
+            overlap = min(end, other[1]) - begin
+            if overlap <= 0 and begin != end and other[0] != other[1]:
+                continue
+            a, b = (current, other) if side == 0 else (other, current)
+            if predicate == 'contains':
+                if not (a[0] <= b[0] and b[1] <= a[1]):
+                    continue
+            elif predicate == 'within':
+                if not (b[0] <= a[0] and a[1] <= b[1]):
+                    continue
+            elif callable(predicate) and not predicate(a, b, overlap):
+                continue
+            shortest = min(a[1] - a[0], b[1] - b[0])
+            if min_ratio and shortest > 0 and overlap < min_ratio * shortest:
+                continue
+            yield (a, b, overlap)
+        others[:] = running
+        active[side].append(current)
+
+
+def get_time_interval(source):
+    """Give the time interval of a file or tier, used as the bounds for
+    :func:`complement`.
+
+    :param source: A :class:`pympi.Elan.Eaf`, :class:`pympi.Praat.TextGrid`
+        or :class:`pympi.Praat.Tier`.
+    :returns: Tuple of the form ``(begin, end)``, in milliseconds for an Eaf
+        and seconds otherwise.
+    """
+    if isinstance(source, Eaf):
+        return source.get_full_time_interval()
+    return (source.xmin, source.xmax)
+
+
+def _sweep(interval_lists, keep):
+    """Give the maximal segments where ``keep`` holds, every boundary is only
+    visited once after sorting.
+
+    :param list interval_lists: Lists of intervals of the form
+        ``[(begin, end, ...)]``.
+    :param function keep: Function that gets the number of lists covering the
+        current segment and whether the first list covers it.
+    :returns: List of segments of the form ``[(begin, end)]``.
+    """
+    events = sorted((t, delta, i) for i, intervals in enumerate(interval_lists)
+                    for begin, end, *_ in intervals if end > begin
+                    for t, delta in ((begin, 1), (end, -1)))
+    counts = [0] * len(interval_lists)
+    covered = 0
+    segments = []
+    start = None
+    k = 0
+    while k < len(events):
+        time = events[k][0]
+        while k < len(events) and events[k][0] == time:
+            _, delta, i = events[k]
+            if delta == 1 and not counts[i]:
+                covered += 1
+            counts[i] += delta
+            if delta == -1 and not counts[i]:
+                covered -= 1
+            k += 1
+        inside = keep(covered, counts[0] > 0)
+        if inside and start is None:
+            start = time
+        elif not inside and start is not None:
+            segments.append((start, time))
+            start = None
+    return segments
+
+
+def union(*interval_lists):
+    """Give the segments covered by at least one of the lists of intervals,
+    for example when anyone is speaking.
+
+    :param list interval_lists: Lists of intervals of the form
+        ``[(begin, end, ...)]``, see :func:`get_intervals`.
+    :returns: Sorted list of segments of the form ``[(begin, end)]``.
+    """
+    return _sweep(interval_lists, lambda covered, first: covered > 0)
+
+
+def intersection(*interval_lists):
+    """Give the segments covered by all the lists of intervals, for example
+    when everyone is speaking.
+
+    :param list interval_lists: Lists of intervals of the form
+        ``[(begin, end, ...)]``, see :func:`get_intervals`.
+    :returns: Sorted list of segments of the form ``[(begin, end)]``.
+    """
+    n = len(interval_lists)
+    return _sweep(interval_lists, lambda covered, first: covered == n)
+
+
+def difference(intervals, *interval_lists):
+    """Give the segments covered by the first list of intervals but by none
+    of the others, for example when someone speaks without gesturing.
+
+    :param list intervals: Intervals of the form ``[(begin, end, ...)]``, see
+        :func:`get_intervals`.
+    :param list interval_lists: Lists of intervals to subtract.
+    :returns: Sorted list of segments of the form ``[(begin, end)]``.
+    """
+    return _sweep((intervals,) + interval_lists,
+                  lambda covered, first: first and covered == 1)
+
+
+def symmetric_difference(*interval_lists):
+    """Give the segments covered by an odd number of the lists of intervals,
+    for two lists these are the segments covered by exactly one of them.
+
+    :param list interval_lists: Lists of intervals of the form
+        ``[(begin, end, ...)]``, see :func:`get_intervals`.
+    :returns: Sorted list of segments of the form ``[(begin, end)]``.
+    """
+    return _sweep(interval_lists, lambda covered, first: covered % 2 == 1)
+
+
+def complement(interval_lists, begin, end):
+    """Give the segments between begin and end covered by none of the lists
+    of intervals, for example the silences.
+
+    :param list interval_lists: Lists of intervals of the form
+        ``[(begin, end, ...)]``, see :func:`get_intervals`.
+    :param begin: Start of the time interval, see :func:`get_time_interval`.
+    :param end: End of the time interval.
+    :returns: Sorted list of segments of the form ``[(begin, end)]``.
+    """
+    segments = []
+    for b, e in union(*interval_lists):
+        if b > begin:
+            segments.append((begin, min(b, end)))
+        begin = max(begin, e)
+        if begin >= end:
+            break
+    if begin < end:
+        segments.append((begin, end))
+    return segments
+
+
+def overlap_matrix(interval_lists):
+    """Give for every pair of lists of intervals, for example speakers, how
+    long and how often they overlap. All boundaries are swept once so the
+    time doesn't depend on the number of pairs, only on the number of lists
+    active at the same time. Overlapping intervals within a list count once.
+
+    :param list interval_lists: Lists of intervals of the form
+        ``[(begin, end, ...)]``, see :func:`get_intervals`.
+    :returns: Tuple of the form ``(durations, counts)`` of square matrices as
+        lists of lists. ``durations[i][j]`` is the time lists ``i`` and ``j``
+        are both active and ``counts[i][j]`` the number of times they start
+        to be both active. The diagonal holds the totals per list: the time it
+        is active and the number of stretches of activity.
+    """
+    k = len(interval_lists)
+    events = sorted((t, delta, i) for i, intervals in enumerate(interval_lists)
+                    for begin, end, *_ in intervals if end > begin
+                    for t, delta in ((begin, 1), (end, -1)))
+    durations = [[0] * k for _ in range(k)]
+    counts = [[0] * k for _ in range(k)]
+    depth = [0] * k
+    active = set()
+    previous = None
+    n = 0
+    while n < len(events):
+        time = events[n][0]
+        if active:
+            duration = time - previous
+            for i in active:
+                row = durations[i]
+                for j in active:
+                    row[j] += duration
+        # Only the state after all events at this time counts, an end and a
+        # begin at the same time is no overlap
+        first = n
+        while n < len(events) and events[n][0] == time:
+            _, delta, i = events[n]
+            depth[i] += delta
+            n += 1
+        if n - first == 1:
+            # A single event, the common case, can only start or stop a list
+            if not depth[i]:
+                active.discard(i)
+                started = ()
+            elif delta == 1 and depth[i] == 1:
+                started = (i,)
+            else:
+                started = ()
+        else:
+            changed = {i for _, _, i in events[first:n]}
+            active.difference_update(i for i in changed if not depth[i])
+            started = {i for i in changed if depth[i] and i not in active}
+        for i in started:
+            counts[i][i] += 1
+            for j in active:
+                counts[i][j] += 1
+                counts[j][i] += 1
+        for i, j in itertools.combinations(started, 2):
+            counts[i][j] += 1
+            counts[j][i] += 1
+        active.update(started)
+        previous = time
+    return durations, counts
+
+
+def write_tier(target, tier_id, segments, value='', seconds=False):
+    """Write segments as a new tier, the segments are inserted in bulk. When
+    the tier already exists the segments are added to it.
+
+    :param target: A :class:`pympi.Elan.Eaf`, :class:`pympi.Praat.TextGrid`
+        or :class:`pympi.Praat.Tier`.
+    :param str tier_id: Name of the tier, ignored for a Praat tier.
+    :param list segments: Segments of the form ``[(begin, end)]`` or
+        ``[(begin, end, value)]``.
+    :param str value: Value for segments without a value.
+    :param bool seconds: Flag to convert the segments from seconds to
+        milliseconds when writing to an Eaf.
+    :returns: The id of the tier for an Eaf and the tier otherwise.
+    """
+    intervals = [(b, e, s[0] if s else value) for b, e, *s in segments]
+    if isinstance(target, Eaf):
+        if seconds:
+            intervals = [(int(round(b*1000)), int(round(e*1000)), v)
+                         for b, e, v in intervals]
+        if tier_id not in target.tiers:
+            target.add_tier(tier_id)
+        target.add_annotations(tier_id, intervals)
+        return tier_id
+    if isinstance(target, Tier):
+        tier = target
+    else:
+        tier = next((t for t in target.get_tiers() if t.name == tier_id),
+                    None)
+    if tier is None:
+        tier = target.add_tier(tier_id)
+    tier.add_intervals(intervals)
+    return tier
+
+
+def _frame(time, offset, frame_rate):
+    """Give the first frame starting at or after a time, rounding first so
+    floating point noise doesn't move boundaries.
+    """
+    return max(0, math.ceil(round((time - offset) * frame_rate, 6)))
+
+
+def rasterize(interval_lists, frame_rate=100, offset=0, vocabulary=None,
+              length=None, multi_hot=False):
+    """Convert intervals to per frame labels, for example for training
+    acoustic models. Frame ``i`` starts at ``offset + i / frame_rate`` and
+    gets the label of the interval it starts in. Every interval is written as
+    one slice assignment from its boundaries instead of querying every frame.
+
+    :param list interval_lists: Lists of intervals of the form
+        ``[(begin, end, value)]`` in seconds, see :func:`get_intervals` with
+        ``seconds=True`` for Eaf tiers.
+    :param float frame_rate: Number of frames per second, 100 for 10ms hops.
+    :param float offset: Time of the start of the first frame.
+    :param vocabulary: Dictionary of the form ``{value: index}`` or a list of
+        values where the index is the position. If ``None`` the sorted values
+        are numbered from 1. Index 0 is used for frames without a label so it
+        should not be used for a value.
+    :param int length: Number of frames, if ``None`` the frames run up to the
+        last end.
+    :param bool multi_hot: Flag to give an array per index, marking with 1
+        the frames where that value occurs, instead of a single array. This is
+        needed when intervals overlap, otherwise the later interval wins.
+    :returns: Tuple of the form ``(frames, vocabulary)``. The frames are an
+        :class:`array.array` of indices or, when ``multi_hot`` is set, a list
+        of arrays with an array for every index.
+    :raises KeyError: If a value is not in the vocabulary.
+    """
+    intervals = [i for intervals in interval_lists for i in intervals]
+    if vocabulary is None:
+        vocabulary = {v: i for i, v in enumerate(
+            sorted({v for _, _, v, *_ in intervals}), 1)}
+    elif not isinstance(vocabulary, dict):
+        vocabulary = {v: i for i, v in enumerate(vocabulary)}
+    if length is None:
+        length = max((_frame(e, offset, frame_rate) for _, e, *_ in intervals),
+                     default=0)
+    if multi_hot:
+        frames = [array.array('b', bytes(length))
+                  for _ in range(max(vocabulary.values(), default=0) + 1)]
+    else:
+        frames = array.array('i', [0]) * length
+    for begin, end, value, *_ in intervals:
+        index = vocabulary[value]
+        first = min(_frame(begin, offset, frame_rate), length)
+        last = min(_frame(end, offset, frame_rate), length)
+        if first < last:
+            if multi_hot:
+                frames[index][first:last] = array.array('b', [1]) *\
+                    (last - first)
+            else:
+                frames[first:last] = array.array('i', [index]) * (last - first)
+    return frames, vocabulary
+
+
+def rasterize_tiers(source, tiers, frame_rate=100, offset=0, vocabulary=None,
+                    length=None, multi_hot=False):
+    """Convert tiers of an Eaf or TextGrid to per frame labels, see
+    :func:`rasterize`. The times of an Eaf are converted to seconds.
+
+    :param source: A :class:`pympi.Elan.Eaf` or :class:`pympi.Praat.TextGrid`.
+    :param list tiers: Names of the tiers.
+    :returns: Tuple of the form ``(frames, vocabulary)``.
+    :raises KeyError: If a tier is non existent or a value is not in the
+        vocabulary.
+    """
+    return rasterize([get_intervals(source, t, seconds=True) for t in tiers],
+                     frame_rate, offset, vocabulary, length, multi_hot)
+
+
+def decode_frames(frames, frame_rate=100, offset=0, vocabulary=None,
+                  min_duration=0, max_gap=0):
+    """Convert per frame labels to intervals, the inverse of
+    :func:`rasterize`. Runs of the same label become one interval, frames
+    with index 0 are gaps.
+
+    :param list frames: Label index per frame.
+    :param float frame_rate: Number of frames per second.
+    :param float offset: Time of the start of the first frame.
+    :param vocabulary: Dictionary of the form ``{value: index}`` or a list of
+        values as used by :func:`rasterize`. If ``None`` the indices are used
+        as values.
+    :param float min_duration: Minimal duration in seconds, shorter intervals
+        are left out. This is done after bridging the gaps.
+    :param float max_gap: Maximal duration in seconds of a gap between two
+        intervals with the same label that is bridged.
+    :returns: List of intervals of the form ``[(begin, end, value)]`` in
+        seconds. Consecutive intervals share their boundaries exactly so they
+        also share timeslots when written to an Eaf with :func:`write_tier`.
+    """
+    if vocabulary is None:
+        values = None
+    elif isinstance(vocabulary, dict):
+        values = {i: v for v, i in vocabulary.items()}
+    else:
+        values = dict(enumerate(vocabulary))
+    max_gap = round(max_gap * frame_rate, 6)
+    min_frames = round(min_duration * frame_rate, 6)
+    runs = []
+    start = 0
+    for label, run in itertools.groupby(frames):
+        end = start + len(list(run))
+        if label:
+            if runs and runs[-1][2] == label and\
+                    start - runs[-1][1] <= max_gap:
+                runs[-1][1] = end
+            else:
+                runs.append([start, end, label])
+        start = end
+    return [(offset + begin / frame_rate, offset + end / frame_rate,
+             label if values is None else values[label])
+            for begin, end, label in runs if end - begin >= min_frames]
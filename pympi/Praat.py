@@ -1,3 +1,4 @@
+import bisect
 import codecs
 import re
 import struct
@@ -15,6 +16,9 @@ class TextGrid:
     :var int tier_num: Number of tiers.
     :var list tiers: Internal (unsorted) list of tiers.
     :var str codec: Codec of the input file.
+    :var dict _tier_index: Cache of the first tier for every name, only use
+        it via :func:`get_tier`. After changing :attr:`tiers` directly
+        :func:`reindex_tiers` has to be called.
     """
     def __init__(self, file_path=None, xmin=0, xmax=None, codec='utf-8'):
         """Construct either a new TextGrid object or read one from a
@@ -32,6 +36,7 @@ class TextGrid:
         :raises Exception: If filepath is not specified but no xmax
         """
         self.tiers = []
+        self._tier_index = None
         self.codec = codec
         if not file_path:
             if xmax is None:
@@ -50,6 +55,7 @@ class TextGrid:
         :param str codec: Text encoding for the input. Note that this will be
             ignored for binary TextGrids.
         """
+        self._tier_index = None
         if ifile.read(12) == b'ooBinaryFile':
             def bin2str(ifile):
                 textlen = struct.unpack('>h', ifile.read(2))[0]
@@ -174,6 +180,7 @@ class TextGrid:
         :param func key: A key function. Default sorts alphabetically.
         """
         self.tiers.sort(key=key)
+        self._tier_index = None
 
     def add_tier(self, name, tier_type='IntervalTier', number=None):
         """Add an IntervalTier or a TextTier on the specified location.
@@ -193,6 +200,7 @@ class TextGrid:
             raise ValueError('tier_type has to be in {}'.format(Tier.P_TIERS))
         self.tiers.insert(number-1,
                           Tier(self.xmin, self.xmax, name, tier_type))
+        self._tier_index = None
         return self.tiers[number-1]
 
     def remove_tier(self, name_num):
@@ -207,18 +215,37 @@ class TextGrid:
             del(self.tiers[name_num-1])
         else:
             self.tiers = [i for i in self.tiers if i.name != name_num]
+        self._tier_index = None
 
     def get_tier(self, name_num):
         """Gives a tier, when multiple tiers exist with that name only the
-        first is returned.
+        first is returned. Names are looked up in an index that is rebuilt
+        when the tiers are changed with the methods, after changing the list
+        of tiers directly :func:`reindex_tiers` has to be called.
 
         :param name_num: Name or number of the tier to return.
         :type name_num: int or str
         :returns: The tier.
         :raises IndexError: If the tier doesn't exist.
         """
-        return self.tiers[name_num - 1] if isinstance(name_num, int) else\
-            [i for i in self.tiers if i.name == name_num][0]
+        if isinstance(name_num, int):
+            return self.tiers[name_num - 1]
+        if self._tier_index is None:
+            self._build_tier_index()
+        tier = self._tier_index.get(name_num)
+        # Names are public so a miss may be a tier that was renamed directly
+        if tier is None or tier.name != name_num:
+            self._build_tier_index()
+            tier = self._tier_index.get(name_num)
+        if tier is None:
+            raise IndexError('Tier {} does not exist'.format(name_num))
+        return tier
+
+    def _build_tier_index(self):
+        """Build the index of the first tier for every name."""
+        self._tier_index = {}
+        for tier in self.tiers:
+            self._tier_index.setdefault(tier.name, tier)
 
     def change_tier_name(self, name_num, name2):
         """Changes the name of the tier, when multiple tiers exist with that
@@ -230,6 +257,13 @@ class TextGrid:
         :raises IndexError: If the tier doesn't exist.
         """
         self.get_tier(name_num).name = name2
+        self._tier_index = None
+
+    def reindex_tiers(self):
+        """Drop the index of the tier names, this is needed after changing
+        :attr:`tiers` directly instead of with the methods.
+        """
+        self._tier_index = None
 
     def get_tiers(self):
         """Give all tiers.
@@ -327,7 +361,9 @@ class TextGrid:
             raise Exception('Unknown mode')
 
     def to_eaf(self, skipempty=True, pointlength=0.1):
-        """Convert the object to an pympi.Elan.Eaf object
+        """Convert the object to an pympi.Elan.Eaf object. The tiers are added
+        in bulk and every distinct boundary time gets a single timeslot that
+        is shared by all tiers.
 
         :param int pointlength: Length of respective interval from points in
                                 seconds
@@ -340,14 +376,17 @@ class TextGrid:
         eaf_out = Eaf()
         if pointlength <= 0:
             raise ValueError('Pointlength should be strictly positive')
+        time_slots = {}
         for tier in self.get_tiers():
             eaf_out.add_tier(tier.name)
-            for ann in tier.get_intervals(True):
-                if tier.tier_type == 'TextTier':
-                    ann = (ann[0], ann[0]+pointlength, ann[1])
-                if ann[2].strip() or not skipempty:
-                    eaf_out.add_annotation(tier.name, int(round(ann[0]*1000)),
-                                           int(round(ann[1]*1000)), ann[2])
+            if tier.tier_type == 'TextTier':
+                anns = ((p, p+pointlength, v) for p, v in tier.get_intervals())
+            else:
+                anns = tier.get_intervals()
+            eaf_out.add_annotations(tier.name, sorted(
+                (int(round(begin*1000)), int(round(end*1000)), value)
+                for begin, end, value in anns
+                if value.strip() or not skipempty), time_slots)
         return eaf_out
 
 
@@ -360,6 +399,9 @@ class Tier:
     :var str tier_type: Type of the tier('IntervalTier' or 'TextTier').
     :var int xmin: Minimum x value.
     :var int xmax: Maximum x value.
+    :var tuple _index: Cache of the sorted intervals with their begin and end
+        times for the time queries. After changing :attr:`intervals` directly
+        :func:`reindex` has to be called.
     """
     P_TIERS = {'IntervalTier', 'TextTier'}
 
@@ -371,6 +413,7 @@ class Tier:
         :raises TierTypeException: If the tier type is unknown.
         """
         self.intervals = []
+        self._index = None
         self.name = name
         self.tier_type = tier_type
         self.xmin, self.xmax = xmin, xmax
@@ -390,6 +433,7 @@ class Tier:
         if check and any(i for i in self.intervals if i[0] == point):
                 raise Exception('No overlap is allowed')
         self.intervals.append((point, value))
+        self._index = None
 
     def add_interval(self, begin, end, value, check=True):
         """Add an interval to the IntervalTier.
@@ -408,6 +452,31 @@ class Tier:
             if begin > end:
                 raise Exception('Begin must be smaller then end')
         self.intervals.append((begin, end, value))
+        self._index = None
+
+    def add_intervals(self, intervals, check=True):
+        """Add multiple intervals to the IntervalTier at once, the check for
+        overlap is done in a single pass over the sorted intervals.
+
+        :param list intervals: Intervals of the form ``[(begin, end, value)]``.
+        :param bool check: Flag to check for overlap.
+        :raises Exception: If overlap, begin > end or wrong tiertype. Nothing
+            is added in that case.
+        """
+        if self.tier_type != 'IntervalTier':
+            raise Exception('Tiertype must be IntervalTier')
+        intervals = list(intervals)
+        if check:
+            last = None
+            for begin, end, _ in sorted(self.intervals + intervals):
+                if last is not None and begin < last:
+                    raise Exception('No overlap is allowed')
+                if begin > end:
+                    raise Exception('Begin must be smaller then end')
+                if last is None or end > last:
+                    last = end
+        self.intervals.extend(intervals)
+        self._index = None
 
     def remove_interval(self, time):
         """Remove an interval, if no interval is found nothing happens.
@@ -419,6 +488,7 @@ class Tier:
             raise Exception('Tiertype must be IntervalTier.')
         self.intervals = [i for i in self.intervals
                           if not(i[0] <= time and i[1] >= time)]
+        self._index = None
 
     def remove_point(self, time):
         """Remove a point, if no point is found nothing happens.
@@ -429,6 +499,7 @@ class Tier:
         if self.tier_type != 'TextTier':
             raise Exception('Tiertype must be TextTier.')
         self.intervals = [i for i in self.intervals if i[0] != time]
+        self._index = None
 
     def get_intervals(self, sort=False):
         """Give all the intervals or points.
@@ -442,6 +513,7 @@ class Tier:
     def clear_intervals(self):
         """Removes all the intervals in the tier"""
         self.intervals = []
+        self._index = None
 
     def get_all_intervals(self):
         """Returns the true list of intervals including the empty intervals."""
@@ -460,3 +532,99 @@ class Tier:
                         ints.insert(index, (i[1], p[0], ''))
                     p = i
         return ints
+
+    def reindex(self):
+        """Drop the index used by the time queries, this is needed after
+        changing :attr:`intervals` directly instead of with the methods.
+        """
+        self._index = None
+
+    def _get_index(self):
+        """Give the sorted intervals with the sorted begin and end times, it
+        is rebuilt after the intervals are changed. Points have the same begin
+        and end time. Intervals are assumed not to overlap so the end times
+        are sorted as well.
+
+        :returns: Tuple of the form ``(intervals, begins, ends)``.
+        """
+        if self._index is None:
+            ints = sorted(self.intervals)
+            begins = [i[0] for i in ints]
+            ends = [i[1] for i in ints] if self.tier_type == 'IntervalTier'\
+                else begins
+            self._index = (ints, begins, ends)
+        return self._index
+
+    def interval_at(self, time):
+        """Give the interval that contains a time, when the time is on the
+        boundary of two intervals the latter is returned.
+
+        :param float time: Time to look for.
+        :returns: The interval or ``None`` if there is no interval at that
+            time.
+        :raises Exception: If the tier is not an IntervalTier.
+        """
+        if self.tier_type != 'IntervalTier':
+            raise Exception('Tiertype must be IntervalTier.')
+        ints, begins, _ = self._get_index()
+        index = bisect.bisect_right(begins, time) - 1
+        if index >= 0 and ints[index][1] >= time:
+            return ints[index]
+
+    def intervals_between(self, begin, end):
+        """Give the intervals that overlap with a time range or the points
+        within the range.
+
+        :param float begin: Start of the range.
+        :param float end: End of the range.
+        :returns: Sorted list of intervals or points.
+        """
+        ints, begins, ends = self._get_index()
+        if self.tier_type == 'IntervalTier':
+            return ints[bisect.bisect_right(ends, begin):
+                        bisect.bisect_left(begins, end)]
+        return ints[bisect.bisect_left(begins, begin):
+                    bisect.bisect_right(begins, end)]
+
+    def interval_before(self, time):
+        """Give the last interval that ends before or at a time or the last
+        point before a time.
+
+        :param float time: Time to look from.
+        :returns: The interval or point or ``None`` if there is none.
+        """
+        ints, _, ends = self._get_index()
+        if self.tier_type == 'IntervalTier':
+            index = bisect.bisect_right(ends, time)
+        else:
+            index = bisect.bisect_left(ends, time)
+        return ints[index - 1] if index else None
+
+    def interval_after(self, time):
+        """Give the first interval that starts at or after a time or the first
+        point after a time.
+
+        :param float time: Time to look from.
+        :returns: The interval or point or ``None`` if there is none.
+        """
+        ints, begins, _ = self._get_index()
+        if self.tier_type == 'IntervalTier':
+            index = bisect.bisect_left(begins, time)
+        else:
+            index = bisect.bisect_right(begins, time)
+        return ints[index] if index < len(ints) else None
+
+    def nearest_point(self, time):
+        """Give the point closest to a time, on a tie the earlier point is
+        returned.
+
+        :param float time: Time to look from.
+        :returns: The point or ``None`` if the tier is empty.
+        :raises Exception: If the tier is not a TextTier.
+        """
+        if self.tier_type != 'TextTier':
+            raise Exception('Tiertype must be TextTier.')
+        ints, begins, _ = self._get_index()
+        index = bisect.bisect_left(begins, time)
+        candidates = ints[max(index - 1, 0):index + 1]
+        return min(candidates, key=lambda p: abs(p[0] - time), default=None)
@@ -1,5 +1,9 @@
 # Import the packages
 from pympi.Praat import TextGrid
 from pympi.Elan import Eaf, eaf_from_chat
+from pympi import Intervals
+from pympi import Evaluation
+from pympi import Agreement
 
-__all__ = ['Praat', 'Elan', 'eaf_from_chat']
+__all__ = ['Praat', 'Elan', 'Intervals', 'Evaluation', 'Agreement',
+           'eaf_from_chat']
@@ -0,0 +1,38 @@
+import concurrent.futures
+import os
+
+from pympi.Elan import Eaf
+from pympi.Praat import TextGrid
+
+
+def load(file_path):
+    """Load an annotation file for a corpus, files ending in ``.eaf`` are
+    read as eaf files and the others as TextGrids.
+
+    :param str file_path: Path of the file.
+    :returns: The :class:`pympi.Elan.Eaf` or :class:`pympi.Praat.TextGrid`.
+    """
+    if file_path.lower().endswith('.eaf'):
+        return Eaf(file_path)
+    return TextGrid(file_path)
+
+
+def map_jobs(function, jobs, processes=None):
+    """Run a function for every job in a pool of processes.
+
+    :param function function: Module level function that gets a job.
+    :param list jobs: Picklable jobs.
+    :param int processes: Number of processes, if ``None`` the number of
+        processors is used and if ``1`` no pool is used.
+    :returns: List of the results in the order of the jobs.
+    :raises ValueError: If the number of processes is smaller than one.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes < 1:
+        raise ValueError('Number of processes must be positive...')
+    if processes == 1 or len(jobs) < 2:
+        return [function(job) for job in jobs]
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(
+            function, jobs, chunksize=max(1, len(jobs) // (processes * 4))))
@@ -36,7 +36,11 @@ None
 Optional requirements
 ---------------------
 
--  `lxml`_ is used for testing.
+-  `lxml`_ is used for testing, for validating EAF files against their
+   XSD and, when requested, for reading and writing EAF files faster. It is
+   never selected automatically because its output differs slightly from the
+   ElementTree output, for example in how empty elements are closed, although
+   both read back to the same object.
 
 Documentation and downloads
 ---------------------------
@@ -120,7 +124,9 @@ sarpu, hadware, thomaskisler, mome, mimrock and xrotwang
                    'Programming Language :: Python :: 3.9',
                    'Topic :: Text Processing :: Linguistic'],
       packages=['pympi'],
+      package_data={'pympi': ['schemas/*.xsd']},
       extras_require={
+        'lxml': ['lxml'],
         'test': [
             'pytest>=5',
             'pytest-mock',
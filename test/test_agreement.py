@@ -0,0 +1,100 @@
+import pytest
+
+from pympi import Eaf, TextGrid
+from pympi.Agreement import agreement, agreement_corpus, boundary_matches,\
+    compare_tiers, confusion, kappa, merge_comparisons, summarize
+
+
+def test_confusion():
+    first = [(0, 2, 'a'), (2, 4, 'b'), (6, 7, 'a')]
+    second = [(1, 3, 'a'), (3, 5, 'b')]
+    assert confusion(first, second) == {
+        ('a', ''): 2, ('a', 'a'): 1, ('b', 'a'): 1, ('b', 'b'): 1,
+        ('', 'b'): 1}
+    assert confusion(first, second, None) == {
+        ('a', 'a'): 1, ('b', 'a'): 1, ('b', 'b'): 1}
+    assert confusion(second, first, 'gap')[('b', 'gap')] == 1
+    assert confusion([], []) == {}
+
+
+def test_kappa():
+    assert kappa({('a', 'a'): 1, ('b', 'b'): 1}) == 1
+    assert kappa({('a', 'a'): 20, ('a', 'b'): 5, ('b', 'a'): 10,
+                  ('b', 'b'): 15}) == pytest.approx(0.4)
+    assert kappa({('a', 'a'): 3}) is None
+    assert kappa({}) is None
+
+
+def test_boundary_matches():
+    first = [(0, 1, 'a'), (1, 2, 'b'), (3, 4, 'c')]
+    second = [(0.01, 1.02, 'a'), (1.02, 2.1, 'b')]
+    assert boundary_matches(first, second) == (2, 5, 3)
+    assert boundary_matches(first, second, 0.1) == (3, 5, 3)
+    assert boundary_matches([(1.5, 2, 'a')], [(1.51, 2, 'a')], 0.01) ==\
+        (2, 2, 2)
+    assert boundary_matches(first, []) == (0, 5, 0)
+
+
+def test_summarize():
+    first = [(0, 2, 'a'), (2, 4, 'b')]
+    second = [(0, 2, 'a'), (2, 3, 'a'), (5, 6, 'c')]
+    comparison = compare_tiers(first, second)
+    assert comparison['overlap'] == (3, 5)
+    result = summarize(comparison)
+    assert result['precision'] == 0.4
+    assert result['recall'] == pytest.approx(2 / 3.0)
+    assert result['f1'] == 0.5
+    assert result['overlap_ratio'] == 0.6
+    assert result['observed'] == pytest.approx(0.4)
+    merged = merge_comparisons([comparison, compare_tiers(first, first)])
+    assert merged['boundaries'] == (5, 6, 8)
+    assert merged['overlap'] == (7, 9)
+    assert merged['confusion'][('a', 'a')] == 4
+    assert summarize(compare_tiers([], [])) == {
+        'precision': None, 'recall': None, 'f1': None,
+        'overlap_ratio': None, 'observed': None, 'kappa': None,
+        'confusion': {}}
+
+
+def annotations():
+    eaf = Eaf()
+    eaf.add_tier('A')
+    eaf.add_tier('B')
+    eaf.add_annotations('A', [(0, 1000, 'x'), (1000, 2000, 'y')])
+    eaf.add_annotations('B', [(0, 1010, 'x'), (1010, 2000, 'x')])
+    tg = TextGrid(xmax=2)
+    tg.add_tier('A').add_intervals([(0, 1, 'x'), (1, 2, 'y')])
+    return eaf, tg
+
+
+def test_agreement():
+    eaf, tg = annotations()
+    result = agreement(eaf, eaf, 'A', 'B')
+    assert result['f1'] == 1
+    assert result['observed'] == pytest.approx(0.5)
+    assert result['confusion'] == pytest.approx({('x', 'x'): 1,
+                                                 ('y', 'x'): 1})
+    assert agreement(eaf, tg, 'A')['kappa'] == 1
+    with pytest.raises(KeyError):
+        agreement(eaf, tg, 'C')
+    # Empty intervals are skipped unless asked otherwise
+    tg.add_tier('C').add_intervals([(0, 1, 'x'), (1, 2, 'y'), (2, 2.5, ' ')])
+    assert agreement(tg, tg, 'A', 'C')['f1'] == 1
+    result = agreement(tg, tg, 'A', 'C', skipempty=False)
+    assert result['recall'] == 1
+    assert result['precision'] == 0.75
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_agreement_corpus(processes, tmp_path):
+    eaf, tg = annotations()
+    eaf.to_file(str(tmp_path / 'a.eaf'))
+    tg.to_file(str(tmp_path / 'a.TextGrid'))
+    pairs = [(str(tmp_path / 'a.eaf'), str(tmp_path / 'a.eaf')),
+             (str(tmp_path / 'a.eaf'), str(tmp_path / 'a.TextGrid'))]
+    per_file, total = agreement_corpus(pairs, 'A', processes=processes)
+    assert per_file[0]['kappa'] == 1
+    assert per_file[1] == agreement(eaf, tg, 'A')
+    assert total['confusion'] == pytest.approx({('x', 'x'): 2, ('y', 'y'): 2})
+    per_file, total = agreement_corpus(pairs[:1], 'A', 'B')
+    assert total == agreement(eaf, eaf, 'A', 'B')
@@ -1,8 +1,12 @@
 from lxml import etree
 import pytest
 
-from pympi import Eaf
+from pympi import Eaf, TextGrid
+from pympi.Elan import AnnotationFilter, eaf_from_chat, eafs_from_chat,\
+    SCHEMA_DIR, XSI, get_schema, get_xml_backend, id_number, indent,\
+    to_adocument, to_string
 import unittest
+from xml.etree import ElementTree
 
 
 class Elan(unittest.TestCase):
@@ -31,6 +35,30 @@ class Elan(unittest.TestCase):
         self.assertRaises(ValueError,
                           self.eaf.add_annotation, 'tier2', 0, 1)
 
+    def test_add_annotations(self):
+        self.eaf.add_tier('tier1')
+        aids = self.eaf.add_annotations(
+            'tier1', [(0, 1000, 'a'), (1000, 2000, 'b'), (3000, 4000, 'c')])
+        self.assertEqual(len(aids), 3)
+        self.assertEqual(
+            sorted(self.eaf.get_annotation_data_for_tier('tier1')),
+            [(0, 1000, 'a'), (1000, 2000, 'b'), (3000, 4000, 'c')])
+        # The shared boundary has one timeslot
+        self.assertEqual(len(self.eaf.timeslots), 5)
+        time_slots = {}
+        self.eaf.add_tier('tier2')
+        self.eaf.add_annotations('tier2', [(0, 500, 'd', 'svg')], time_slots)
+        self.eaf.add_annotations('tier2', [(500, 700, 'e')], time_slots)
+        self.assertEqual(sorted(time_slots), [0, 500, 700])
+        self.assertEqual(len(self.eaf.timeslots), 8)
+        self.assertEqual([v[3] for v in self.eaf.tiers['tier2'][0].values()],
+                         ['svg', None])
+        self.assertRaises(ValueError, self.eaf.add_annotations, 'tier1',
+                          [(0, 1, 'ok'), (2, 2, 'zero')])
+        self.assertEqual(len(self.eaf.get_annotation_data_for_tier('tier1')),
+                         3)
+        self.assertRaises(KeyError, self.eaf.add_annotations, 't', [])
+
     def test_add_controlled_vocabulary(self):
         self.eaf.add_controlled_vocabulary('cv1')
         self.eaf.add_controlled_vocabulary('cv2')
@@ -176,6 +204,40 @@ class Elan(unittest.TestCase):
         self.assertRaises(KeyError,
                           self.eaf.add_ref_annotation, 'aa', 'bb', 0, 'r1')
 
+    def test_add_ref_annotations(self):
+        self.eaf.add_tier('p1')
+        self.eaf.add_linguistic_type('c', 'Symbolic_Subdivision')
+        self.eaf.add_tier('a1', 'c', 'p1')
+        p1 = self.eaf.add_annotation('p1', 0, 1000, 'a1')
+        p2 = self.eaf.add_annotation('p1', 1000, 2000, 'a2')
+        self.assertEqual(self.eaf.annotations[p1], 'p1')
+        r1 = self.eaf.add_ref_annotation_by_id('a1', p2, 'ref1')
+        self.assertEqual(self.eaf.tiers['a1'][1][r1], (p2, 'ref1', None, None))
+        aids = self.eaf.add_ref_annotations(
+            'a1', [(p1, 'x'), (p2, 'y'), (p1, 'z')])
+        self.assertEqual([self.eaf.tiers['a1'][1][a][2] for a in aids],
+                         [None, r1, aids[0]])
+        self.assertEqual(sorted(self.eaf.get_ref_annotation_data_for_tier(
+            'a1')), [(0, 1000, 'x', 'a1'), (0, 1000, 'z', 'a1'),
+                     (1000, 2000, 'ref1', 'a2'), (1000, 2000, 'y', 'a2')])
+        # New children continue the existing chain of their parent
+        more = self.eaf.add_ref_annotations('a1', [(p1, 'w'), (p2, 'v')])
+        self.assertEqual([self.eaf.tiers['a1'][1][a][2] for a in more],
+                         [aids[2], aids[1]])
+
+        self.assertRaises(ValueError, self.eaf.add_ref_annotations,
+                          'a1', [(p1, 'x'), ('a999', 'y')])
+        self.assertEqual(len(self.eaf.tiers['a1'][1]), 6)
+        # Only annotations on the parent tier can be referenced
+        self.eaf.add_tier('a2', 'c', 'a1')
+        self.assertRaises(ValueError, self.eaf.add_ref_annotations,
+                          'a2', [(r1, 'x'), (p1, 'y')])
+        self.assertEqual(self.eaf.tiers['a2'][1], {})
+        self.assertRaises(ValueError, self.eaf.add_ref_annotation_by_id,
+                          'p1', p1, 'r')
+        self.assertRaises(KeyError, self.eaf.add_ref_annotation_by_id,
+                          'aa', p1, 'r')
+
     def test_add_secondary_linked_file(self):
         self.eaf.add_secondary_linked_file('/some/file/path/test.wav')
         self.assertEqual(self.eaf.linked_file_descriptors[0]['MIME_TYPE'],
@@ -200,6 +262,64 @@ class Elan(unittest.TestCase):
         self.assertRaises(KeyError,
                           self.eaf.add_secondary_linked_file, '/test.wierd')
 
+    def test_add_textgrid_tiers(self):
+        self.eaf.add_tier('utt')
+        u1 = self.eaf.add_annotation('utt', 1000, 2000, 'u1')
+        u2 = self.eaf.add_annotation('utt', 2000, 4000, 'u2')
+        tg = TextGrid(xmax=5)
+        tg.add_tier('words').add_intervals([
+            (0.5, 0.8, 'out'), (0.998, 1.5, 'w1'), (1.5, 2.002, 'w2'),
+            (2.002, 2.5, ''), (2.5, 4.2, 'w3')])
+        tg.add_tier('points', 'TextTier').add_point(3.0, 'p')
+        added = self.eaf.add_textgrid_tiers(tg, 'utt', prefix='mfa-',
+                                            tolerance=5)
+        self.assertEqual(sorted(added), ['mfa-points', 'mfa-words'])
+        self.assertEqual(
+            self.eaf.get_parameters_for_tier('mfa-words')['PARENT_REF'],
+            'utt')
+        ling = self.eaf.get_parameters_for_tier('mfa-words')[
+            'LINGUISTIC_TYPE_REF']
+        self.assertEqual(self.eaf.linguistic_types[ling]['CONSTRAINTS'],
+                         'Included_In')
+        self.assertEqual(
+            self.eaf.get_annotation_data_for_tier('mfa-words'),
+            [(1000, 1500, 'w1'), (1500, 2000, 'w2'), (2500, 4000, 'w3')])
+        self.assertEqual(
+            self.eaf.get_annotation_data_for_tier('mfa-points'),
+            [(3000, 3100, 'p')])
+        # Coinciding boundaries share the timeslots of the parent
+        words = self.eaf.tiers['mfa-words'][0]
+        aids = added['mfa-words']
+        self.assertEqual(words[aids[0]][0], self.eaf.tiers['utt'][0][u1][0])
+        self.assertEqual(words[aids[1]][1], self.eaf.tiers['utt'][0][u1][1])
+        self.assertEqual(words[aids[2]][1], self.eaf.tiers['utt'][0][u2][1])
+        self.assertEqual(words[aids[0]][1], words[aids[1]][0])
+
+        self.assertRaises(ValueError, self.eaf.add_textgrid_tiers, tg, 'utt',
+                          prefix='mfa-')
+        self.assertRaises(IndexError, self.eaf.add_textgrid_tiers, tg,
+                          'utt', ['none'])
+        self.assertRaises(KeyError, self.eaf.add_textgrid_tiers, tg, 'none')
+        self.assertRaises(KeyError, self.eaf.add_textgrid_tiers, tg, 'utt',
+                          ling='none')
+        added = self.eaf.add_textgrid_tiers(tg, 'utt', ['words'])
+        self.assertEqual(list(added), ['words'])
+        self.assertEqual(
+            self.eaf.get_annotation_data_for_tier('words'),
+            [(1000, 1500, 'w1'), (1500, 2000, 'w2'), (2500, 4000, 'w3')])
+
+        # Duplicate names in the TextGrid are rejected before adding anything
+        tg.add_tier('points')
+        tiers = len(self.eaf.tiers)
+        self.assertRaises(ValueError, self.eaf.add_textgrid_tiers, tg, 'utt',
+                          prefix='dup-')
+        self.assertEqual(len(self.eaf.tiers), tiers)
+        # Empty symbolic tiers can't be the parent either
+        self.eaf.add_linguistic_type('sub', 'Symbolic_Subdivision', False)
+        self.eaf.add_tier('sym', 'sub', 'utt')
+        self.assertRaises(ValueError, self.eaf.add_textgrid_tiers, tg, 'sym',
+                          ['words'], 'sym-')
+
     def test_add_tier(self):
         self.eaf.add_locale('ru')
         self.eaf.add_language('RUS')
@@ -391,6 +511,52 @@ class Elan(unittest.TestCase):
 
         self.assertRaises(KeyError, self.eaf.filter_annotations, 'a')
 
+    def test_filter_annotations_to_tiers(self):
+        self.eaf.add_tier('tier1')
+        self.eaf.add_annotation('tier1', 0, 1, '1')
+        self.eaf.add_annotation('tier1', 1, 2, '2')
+        self.eaf.add_annotation('tier1', 2, 3, 'x3')
+        filters = {'digits': AnnotationFilter(['[0-9]'], regex=True),
+                   'x': AnnotationFilter(filtex=['1', '2'])}
+        self.assertEqual(
+            self.eaf.filter_annotations_to_tiers('tier1', filters),
+            ['digits', 'x'])
+        self.assertEqual(
+            sorted(self.eaf.get_annotation_data_for_tier('digits')),
+            [(0, 1, '1'), (1, 2, '2')])
+        self.assertEqual(self.eaf.get_annotation_data_for_tier('x'),
+                         [(2, 3, 'x3')])
+        self.assertRaises(KeyError, self.eaf.filter_annotations_to_tiers,
+                          'a', filters)
+
+    def test_annotation_filter(self):
+        filt = AnnotationFilter()
+        self.assertTrue(filt.match('a'))
+        filt = AnnotationFilter(['a', 'b'], ['b'])
+        self.assertTrue(filt.match('a'))
+        self.assertFalse(filt.match('b'))
+        self.assertFalse(filt.match('ab'))
+        filt = AnnotationFilter(['a', 'b+'], ['bbb'], regex=True)
+        self.assertTrue(filt.match('ab'))
+        self.assertTrue(filt.match('bb'))
+        self.assertFalse(filt.match('bbbb'))
+        self.assertFalse(filt.match('cab'))
+        # Patterns that can't be combined in one alternation
+        filt = AnnotationFilter([r'(?P<x>a)(?P=x)', r'(?P<x>b)'], regex=True)
+        self.assertTrue(filt.match('aa'))
+        self.assertTrue(filt.match('b'))
+        self.assertFalse(filt.match('a'))
+        # Numbered backreferences would point to the wrong group
+        filt = AnnotationFilter([r'(a)\1', r'(b)\1'], regex=True)
+        self.assertTrue(filt.match('aa'))
+        self.assertTrue(filt.match('bb'))
+        self.assertFalse(filt.match('ab'))
+        # Flags of one pattern don't apply to the others
+        filt = AnnotationFilter(['(?i)abc', 'XYZ'], regex=True)
+        self.assertTrue(filt.match('ABC'))
+        self.assertTrue(filt.match('XYZ'))
+        self.assertFalse(filt.match('xyz'))
+
     def test_get_annotation_data_at_time(self):
         self.eaf.add_tier('tier1')
         self.eaf.add_annotation('tier1', 0, 1000, 'a1')
@@ -468,6 +634,43 @@ class Elan(unittest.TestCase):
         self.assertRaises(KeyError,
                           self.eaf.get_annotation_data_for_tier, 'tier2')
 
+    def test_get_annotation_data_for_symbsub_tier(self):
+        self.eaf.add_linguistic_type('sub', 'Symbolic_Subdivision', False)
+        self.eaf.add_tier('utt')
+        self.eaf.add_tier('word', 'sub', 'utt')
+        self.eaf.add_tier('morph', 'sub', 'word')
+        u1 = self.eaf.add_annotation('utt', 0, 900, 'u1')
+        u2 = self.eaf.add_annotation('utt', 1000, 1200, 'u2')
+        # Added out of order, the previous annotations give the order
+        w3 = self.eaf.add_ref_annotation_by_id('word', u1, 'w3')
+        w5 = self.eaf.add_ref_annotation_by_id('word', u2, 'w5')
+        w1 = self.eaf.add_ref_annotation_by_id('word', u1, 'w1')
+        w2 = self.eaf.add_ref_annotation_by_id('word', u1, 'w2', w1)
+        w4 = self.eaf.add_ref_annotation_by_id('word', u2, 'w4')
+        self.eaf.tiers['word'][1][w3] = (u1, 'w3', w2, None)
+        self.eaf.tiers['word'][1][w5] = (u2, 'w5', w4, None)
+        self.assertEqual(self.eaf.get_ref_annotation_order('word'),
+                         {u1: [w1, w2, w3], u2: [w4, w5]})
+        self.assertEqual(
+            self.eaf.get_annotation_data_for_symbsub_tier('word'),
+            [(0, 300, 'w1'), (300, 600, 'w2'), (600, 900, 'w3'),
+             (1000, 1100, 'w4'), (1100, 1200, 'w5')])
+        self.eaf.add_ref_annotations('morph', [(w2, 'm1'), (w2, 'm2')])
+        self.assertEqual(
+            self.eaf.get_annotation_data_for_symbsub_tier('morph'),
+            [(300, 450, 'm1'), (450, 600, 'm2')])
+        # Cycles in the chains don't lose annotations
+        self.eaf.tiers['word'][1][w4] = (u2, 'w4', w5, None)
+        self.assertEqual(
+            set(self.eaf.get_ref_annotation_order('word')[u2]), {w4, w5})
+        self.assertRaises(KeyError,
+                          self.eaf.get_annotation_data_for_symbsub_tier, 'x')
+        # Cycles in the parent tiers are rejected
+        self.eaf.tiers['word'][2]['PARENT_REF'] = 'morph'
+        self.assertRaises(ValueError,
+                          self.eaf.get_annotation_data_for_symbsub_tier,
+                          'morph')
+
     def test_get_child_tiers_for(self):
         self.eaf.add_tier('parent1')
         self.eaf.add_tier('parent2')
@@ -481,6 +684,14 @@ class Elan(unittest.TestCase):
                          ['child11', 'child12', 'child13'])
         self.assertEqual(sorted(self.eaf.child_tiers_for('parent2')), [])
         self.assertRaises(KeyError, self.eaf.child_tiers_for, 'parent3')
+        self.eaf.remove_tier('child12')
+        self.assertEqual(self.eaf.get_child_tiers_for('parent1'),
+                         ['child11', 'child13'])
+        self.eaf.add_tier('child13', parent='parent2')
+        self.assertEqual(self.eaf.get_child_tiers_for('parent1'),
+                         ['child11'])
+        self.assertEqual(self.eaf.get_child_tiers_for('parent2'),
+                         ['child13'])
 
     def test_get_full_time_interval(self):
         self.assertEqual(self.eaf.get_full_time_interval(), (0, 0))
@@ -488,6 +699,38 @@ class Elan(unittest.TestCase):
         self.eaf.add_annotation('tier1', 100, 500, 'a')
         self.eaf.add_annotation('tier1', 500, 1000, 'b')
         self.assertEqual(self.eaf.get_full_time_interval(), (100, 1000))
+        self.eaf.add_annotation('tier1', 50, 60, 'c')
+        self.eaf.add_annotations('tier1', [(2000, 3000, 'd')])
+        self.assertEqual(self.eaf.full_time_interval, (50, 3000))
+        self.eaf.remove_annotation('tier1', 2500)
+        self.assertEqual(self.eaf.full_time_interval, (50, 1000))
+        self.eaf.shift_annotations(100)
+        self.assertEqual(self.eaf.full_time_interval, (150, 1100))
+        ts = list(self.eaf.timeslots)[0]
+        self.eaf.timeslots[ts] = 10
+        self.eaf.invalidate_time_intervals()
+        self.assertEqual(self.eaf.full_time_interval, (10, 1100))
+
+    def test_tier_time_intervals(self):
+        self.eaf.add_tier('tier1')
+        self.eaf.add_linguistic_type('c', 'Symbolic_Association', False)
+        self.eaf.add_tier('tier2', 'c', 'tier1')
+        self.assertEqual(self.eaf.tier_time_intervals,
+                         {'default': None, 'tier1': None, 'tier2': None})
+        self.eaf.add_annotation('tier1', 100, 500, 'a')
+        self.eaf.add_annotations('tier1', [(600, 700, 'b'), (0, 50, 'c')])
+        self.eaf.add_ref_annotation('tier2', 'tier1', 650, 'r')
+        self.assertEqual(self.eaf.tier_time_intervals['tier1'], (0, 700))
+        self.assertEqual(self.eaf.tier_time_intervals['tier2'], (600, 700))
+        self.eaf.add_annotation('tier1', 800, 900, 'd')
+        self.assertEqual(self.eaf.tier_time_intervals['tier1'], (0, 900))
+        self.eaf.remove_annotation('tier1', 850)
+        self.eaf.remove_annotation('tier1', 25)
+        self.assertEqual(self.eaf.tier_time_intervals['tier1'], (100, 700))
+        self.eaf.rename_tier('tier1', 'tier3')
+        self.assertEqual(self.eaf.tier_time_intervals,
+                         {'default': None, 'tier2': (600, 700),
+                          'tier3': (100, 700)})
 
     def test_get_gaps_and_overlaps2(self):
         self.eaf.add_tier('t1')
@@ -628,6 +871,21 @@ class Elan(unittest.TestCase):
             self.eaf.get_locales(),
             {'ru': ('RUS', 'YAWERTY (Phonetic)'), 'en': (None, None)})
 
+    def test_get_overlap_matrix(self):
+        self.eaf.add_tier('A')
+        self.eaf.add_tier('B')
+        self.eaf.add_tier('C', parent='A')
+        self.eaf.add_annotations('A', [(0, 1000, 'a'), (2000, 3000, 'a')])
+        self.eaf.add_annotations('B', [(500, 2500, 'b')])
+        self.eaf.add_annotations('C', [(0, 100, 'c')])
+        self.assertEqual(self.eaf.get_overlap_matrix(), (
+            ['default', 'A', 'B'], [[0, 0, 0], [0, 2000, 1000],
+                                    [0, 1000, 2000]],
+            [[0, 0, 0], [0, 2, 2], [0, 2, 1]]))
+        self.assertEqual(self.eaf.get_overlap_matrix(['C', 'A'])[1],
+                         [[100, 100], [100, 2000]])
+        self.assertRaises(KeyError, self.eaf.get_overlap_matrix, ['D'])
+
     def test_get_parameters_for_tier(self):
         self.eaf.add_tier('tier1', 'default-lt', 'tier1', None, 'person',
                           'person2')
@@ -734,6 +992,33 @@ class Elan(unittest.TestCase):
                                 'l2')), ['t2', 't3'])
         self.assertEqual(sorted(self.eaf.get_tier_ids_for_linguistic_type(
                                 'default-lt', 't1')), ['t4'])
+        self.eaf.rename_tier('t1', 't1a')
+        self.eaf.remove_tier('t3')
+        self.assertEqual(sorted(self.eaf.get_tier_ids_for_linguistic_type(
+                         'l1')), ['t1a', 't5'])
+        self.assertEqual(self.eaf.get_tier_ids_for_linguistic_type('l2'),
+                         ['t2'])
+        self.assertEqual(self.eaf.get_tier_ids_for_linguistic_type(
+                         'default-lt', 't1a'), ['t4'])
+        self.assertEqual(self.eaf.get_tier_ids_for_linguistic_type('l3'), [])
+
+    def test_get_tier_hierarchy_order(self):
+        self.eaf.add_tier('c1', parent='p1')
+        self.eaf.add_tier('p1')
+        self.eaf.add_tier('c11', parent='c1')
+        self.eaf.add_tier('c2', parent='p1')
+        self.eaf.add_tier('orphan', parent='none')
+        self.assertEqual(self.eaf.get_tier_hierarchy_order(),
+                         ('default', 'p1', 'c1', 'c11', 'c2', 'orphan'))
+        self.eaf.rename_tier('p1', 'p')
+        self.eaf.remove_tier('c2')
+        self.assertEqual(self.eaf.get_tier_hierarchy_order(),
+                         ('default', 'p', 'c1', 'c11', 'orphan'))
+        self.eaf.tiers['c1'][2]['PARENT_REF'] = 'default'
+        self.eaf.reindex_tiers()
+        self.assertEqual(self.eaf.get_tier_hierarchy_order(),
+                         ('default', 'c1', 'c11', 'p', 'orphan'))
+        self.assertEqual(self.eaf.get_child_tiers_for('p'), [])
 
     def test_get_tier_names(self):
         self.eaf.add_tier('tier1')
@@ -796,6 +1081,26 @@ class Elan(unittest.TestCase):
         self.assertEqual(
             sorted(self.eaf.get_annotation_data_for_tier('mm')), mm)
         self.assertRaises(KeyError, self.eaf.merge_tiers, ['a', 'b'])
+        self.assertNotIn('a_b_merged', self.eaf.get_tier_names())
+
+        # Merged annotations reuse the original timeslots
+        timeslots = len(self.eaf.timeslots)
+        self.eaf.merge_tiers(['tier1', 'tier2'], 'm_7', 7)
+        self.assertEqual(len(self.eaf.timeslots), timeslots)
+        self.assertEqual(
+            sorted(self.eaf.get_annotation_data_for_tier('m_7')), m6)
+
+    def test_merge_tiers_zero_length(self):
+        self.eaf.add_tier('tier1')
+        self.eaf.add_annotation('tier1', 0, 1000, 'a1')
+        self.eaf.add_annotation('tier1', 2000, 2500, 'a2')
+        ts = list(self.eaf.tiers['tier1'][0].values())[1][0]
+        self.eaf.timeslots[ts] = 2500
+        self.assertRaises(ValueError, self.eaf.merge_tiers, ['tier1'], 'm')
+        self.assertNotIn('m', self.eaf.get_tier_names())
+        self.eaf.merge_tiers(['tier1'], 'm', safe=True)
+        self.assertEqual(self.eaf.get_annotation_data_for_tier('m'),
+                         [(0, 1000, 'a1')])
 
     def test_remove_all_annotations_from_tier(self):
         self.eaf.add_tier('tier1')
@@ -1062,6 +1367,40 @@ class Elan(unittest.TestCase):
         self.assertEqual(self.eaf.shift_annotations(-200),
                          ([('tier2', 100, 250, 'b1')],
                           [('tier1', 100, 200, 'a1')]))
+        self.assertEqual(
+            sorted(self.eaf.get_annotation_data_for_tier('tier2')),
+            [(0, 50, 'b1'), (400, 1400, 'b1')])
+        self.assertEqual(len(self.eaf.timeslots), 6)
+
+    def test_shift_annotations_shared_timeslots(self):
+        self.eaf.add_tier('tier1')
+        self.eaf.add_tier('tier2')
+        self.eaf.add_annotation('tier1', 100, 200, 'a1')
+        a1 = list(self.eaf.tiers['tier1'][0].values())[0]
+        # Second annotation sharing the end timeslot of the first
+        self.eaf.tiers['tier1'][0]['a100'] = (
+            a1[1], self.eaf.generate_ts_id(300), 'a2', None)
+        self.eaf.annotations['a100'] = 'tier1'
+        # Annotation on another tier sharing the begin timeslot
+        self.eaf.tiers['tier2'][0]['a101'] = (
+            a1[0], self.eaf.generate_ts_id(400), 'b1', None)
+        self.eaf.annotations['a101'] = 'tier2'
+
+        self.eaf.shift_annotations(10)
+        self.assertEqual(
+            sorted(self.eaf.get_annotation_data_for_tier('tier1')),
+            [(110, 210, 'a1'), (210, 310, 'a2')])
+        self.assertEqual(self.eaf.get_annotation_data_for_tier('tier2'),
+                         [(110, 410, 'b1')])
+
+        self.eaf.shift_annotations(0, {'tier2': 100}, 2)
+        self.assertEqual(
+            sorted(self.eaf.get_annotation_data_for_tier('tier1')),
+            [(220, 420, 'a1'), (420, 620, 'a2')])
+        self.assertEqual(self.eaf.get_annotation_data_for_tier('tier2'),
+                         [(320, 920, 'b1')])
+        self.assertEqual(len(self.eaf.timeslots), 5)
+        self.assertRaises(KeyError, self.eaf.shift_annotations, 0, {'a': 1})
 
     def test_to_textgrid(self):
         self.eaf.remove_tier('default')
@@ -1121,6 +1460,61 @@ class Elan(unittest.TestCase):
                           (0.2, 0.3, 'a31'), (0.3, 0.4, 'a41')])
         self.assertEqual(list(tg.get_tier('t7').get_intervals()), [])
 
+    def test_to_textgrid_overlap(self):
+        self.eaf.add_tier('t1')
+        self.eaf.add_annotation('t1', 0, 1000, 'a')
+        self.eaf.add_annotation('t1', 500, 1500, 'b')
+        self.eaf.add_annotation('t1', 600, 900, 'c')
+        self.eaf.add_annotation('t1', 2000, 3000, 'd')
+        self.assertRaises(ValueError, self.eaf.to_textgrid, overlap='x')
+
+        tg, report = self.eaf.to_textgrid(filtin=['t1'], report=True)
+        self.assertEqual(list(tg.get_tier('t1').get_intervals()),
+                         [(0, 1, 'a'), (2, 3, 'd')])
+        self.assertEqual(report, {'t1': (2, 0)})
+
+        tg, report = self.eaf.to_textgrid(
+            filtin=['t1'], overlap='clip', report=True)
+        self.assertEqual(list(tg.get_tier('t1').get_intervals()),
+                         [(0, 1, 'a'), (1, 1.5, 'b'), (2, 3, 'd')])
+        self.assertEqual(report, {'t1': (1, 1)})
+
+        tg, report = self.eaf.to_textgrid(
+            filtin=['t1'], overlap='split', report=True)
+        self.assertEqual([a[1] for a in tg.get_tier_name_num()],
+                         ['t1', 't1_overlap1', 't1_overlap2'])
+        self.assertEqual(list(tg.get_tier('t1').get_intervals()),
+                         [(0, 1, 'a'), (2, 3, 'd')])
+        self.assertEqual(list(tg.get_tier('t1_overlap1').get_intervals()),
+                         [(0.5, 1.5, 'b')])
+        self.assertEqual(list(tg.get_tier('t1_overlap2').get_intervals()),
+                         [(0.6, 0.9, 'c')])
+        self.assertEqual(report, {'t1': (0, 2)})
+        # Names of existing tiers are skipped
+        self.eaf.add_tier('t1_overlap1')
+        tg = self.eaf.to_textgrid(filtin=['t1', 't1_overlap1'],
+                                  overlap='split')
+        self.assertEqual([a[1] for a in tg.get_tier_name_num()],
+                         ['t1', 't1_overlap2', 't1_overlap3', 't1_overlap1'])
+        self.assertEqual(list(tg.get_tier('t1_overlap2').get_intervals()),
+                         [(0.5, 1.5, 'b')])
+
+    def test_reserve_ids(self):
+        self.eaf.add_tier('tier1')
+        self.eaf.add_annotation('tier1', 0, 1000, 'a')
+        aids = self.eaf.reserve_annotation_ids(3)
+        self.assertEqual(aids, ['a3', 'a4', 'a5'])
+        self.assertEqual(self.eaf.generate_annotation_id(), 'a6')
+        self.assertEqual(self.eaf.reserve_ts_ids(2), ['ts4', 'ts5'])
+        self.assertEqual(self.eaf.generate_ts_id(5), 'ts6')
+        self.assertEqual(self.eaf.reserve_ts_ids(0), [])
+        self.assertRaises(ValueError, self.eaf.reserve_annotation_ids, -1)
+        # Without counters the maxima are taken from the existing ids
+        self.eaf.maxaid = self.eaf.maxts = None
+        self.eaf.annotations['x12'] = 'tier1'
+        self.assertEqual(self.eaf.generate_annotation_id(), 'a13')
+        self.assertEqual(self.eaf.reserve_ts_ids(1), ['ts7'])
+
     def test_add_nested_reference_annotations(self):
         self.eaf.add_linguistic_type('refT')
         self.eaf.add_linguistic_type('orthT', 'Symbolic_Association')
@@ -1137,9 +1531,6 @@ class Elan(unittest.TestCase):
     def test_parse_eaf(self):
         pass
 
-    def test_eaf_from_chat(self):
-        pass
-
 
 @pytest.mark.parametrize(
     'eaf,schema',
@@ -1149,15 +1540,203 @@ class Elan(unittest.TestCase):
         ('sample_3.0.eaf', 'EAFv3.0.xsd'),
     ]
 )
-def test_to_file_to_eaf(eaf, schema, test_dir, tmp_path):
+@pytest.mark.parametrize('backend', ['etree', 'lxml'])
+def test_to_file_to_eaf(eaf, schema, backend, test_dir, tmp_path):
     filepath = str(tmp_path / 'test.eaf')
-    eaf = Eaf(str(test_dir / eaf))
-    eaf.to_file(filepath)
+    eaf = Eaf(str(test_dir / eaf), backend=backend)
+    eaf.to_file(filepath, backend=backend)
 
-    schema = etree.XMLSchema(etree.XML(test_dir.joinpath(schema).read_text(encoding='utf8')))
+    schema = etree.XMLSchema(etree.XML(
+        SCHEMA_DIR.joinpath(schema).read_text(encoding='utf8')))
     xmlparser = etree.XMLParser(schema=schema)
     etree.parse(str(filepath), xmlparser)
 
 
+def eaf_state(eaf):
+    return {k: v for k, v in vars(eaf).items() if not k.startswith('_')}
+
+
+@pytest.mark.parametrize('eaf', ['sample_2.7.eaf', 'sample_3.0.eaf'])
+def test_xml_backends(eaf, test_dir, tmp_path):
+    eaf_etree = Eaf(str(test_dir / eaf), backend='etree')
+    eaf_lxml = Eaf(str(test_dir / eaf), backend='lxml')
+    assert eaf_state(eaf_etree) == eaf_state(eaf_lxml)
+
+    eaf_etree.to_file(str(tmp_path / 'etree.eaf'), backend='etree')
+    eaf_etree.to_file(str(tmp_path / 'lxml.eaf'), backend='lxml')
+    written_etree = (tmp_path / 'etree.eaf').read_text(encoding='utf8')
+    written_lxml = (tmp_path / 'lxml.eaf').read_text(encoding='utf8')
+    # Only the position of the namespace declaration and the space before
+    # self closing tags differ
+    assert written_etree.replace(' />', '/>').splitlines()[2:] ==\
+        written_lxml.splitlines()[2:]
+    assert eaf_state(Eaf(str(tmp_path / 'lxml.eaf'))) ==\
+        eaf_state(Eaf(str(tmp_path / 'etree.eaf')))
+    assert to_string(eaf_etree, backend='lxml') ==\
+        etree.tostring(to_adocument(eaf_etree, backend='lxml'),
+                       encoding='unicode')
+
+
+def test_validate(test_dir, tmp_path):
+    eaf = Eaf()
+    eaf.add_tier('tier1')
+    eaf.add_linguistic_type('sub', 'Symbolic_Subdivision')
+    eaf.add_tier('tier2', 'sub', 'tier1')
+    aid = eaf.add_annotation('tier1', 0, 1000, 'a')
+    eaf.add_ref_annotation_by_id('tier2', aid, 'b')
+    assert eaf.validate() == []
+    assert eaf.validate(schema=False) == []
+
+    del eaf.timeslots[eaf.tiers['tier1'][0][aid][0]]
+    eaf.tiers['tier2'][2]['PARENT_REF'] = 'nope'
+    eaf.tiers['tier2'][1]['a9'] = (aid, 'c', 'a8', None)
+    errors = eaf.validate_references()
+    assert len(errors) == 4
+    assert any('unknown time slot' in e for e in errors)
+    assert any('unknown parent tier nope' in e for e in errors)
+    assert any('unknown previous annotation a8' in e for e in errors)
+    assert any('a9 in tier tier2 is indexed in tier None' in e
+               for e in errors)
+    assert len(eaf.validate()) > 4
+
+    eaf.to_file(str(tmp_path / 'invalid.eaf'))
+    for backend in ['etree', 'lxml']:
+        with pytest.raises(ValueError, match='Invalid eaf file'):
+            Eaf(str(tmp_path / 'invalid.eaf'), backend=backend,
+                validate=True)
+    assert get_schema('3.0') is get_schema('3.0')
+    with pytest.raises(ValueError):
+        get_schema('1.0')
+
+    # Versions without a schema are treated the same when parsing and
+    # when validating the object
+    with pytest.warns(UserWarning, match='No schema'):
+        eaf = Eaf(str(test_dir / 'sample_2.7.eaf'), validate=True)
+    with pytest.warns(UserWarning, match='No schema'):
+        assert eaf.validate() == []
+    with pytest.raises(ValueError):
+        eaf.validate(schema=True)
+
+
+def test_get_xml_backend():
+    assert get_xml_backend() is ElementTree
+    assert get_xml_backend('lxml') is etree
+    assert get_xml_backend('etree') is ElementTree
+    with pytest.raises(ValueError):
+        get_xml_backend('sax')
+    # lxml is opt-in so the default output doesn't depend on it
+    assert isinstance(to_adocument(Eaf()), ElementTree.Element)
+
+
+def test_parse_eaf_invalid(tmp_path):
+    truncated = ('<ANNOTATION_DOCUMENT VERSION="3.0" xmlns:xsi="{}" '
+                 'xsi:noNamespaceSchemaLocation=""><HEADER/><TIER'.format(XSI))
+    for text in ['no xml', truncated]:
+        (tmp_path / 'broken.eaf').write_text(text)
+        for backend in ['etree', 'lxml']:
+            with pytest.raises(Exception, match='Unable to parse eaf'):
+                Eaf(str(tmp_path / 'broken.eaf'), backend=backend)
+
+
+CHAT = (u'@UTF8\n@Begin\n@Languages:\teng\n'
+        u'@Participants:\tCHI Target_Child, MOT Mother\n'
+        u'@ID:\teng|corpus|CHI|||||Target_Child|||\n'
+        u'@ID:\teng|corpus|MOT|||||Mother|||\n'
+        u'*CHI:\thello thére .\x150_1000\x15\n'
+        u'%mor:\tco|hello adv|there .\n'
+        u'*MOT:\thi .\x151000_2000\x15\n'
+        u'%mor:\tco|hi\n'
+        u'\tcontinued .\n'
+        u'%com:\tlaughs\n')
+
+
+@pytest.mark.parametrize(
+    'identifier,number',
+    [('a12', 12), ('ts3', 3), ('x1y20', 20), ('ann', 0)]
+)
+def test_id_number(identifier, number):
+    assert id_number(identifier) == number
+
+
+def test_parse_eaf_max_ids(test_dir):
+    eaf = Eaf(str(test_dir / 'sample_2.8.eaf'))
+    assert eaf.maxaid == max(map(id_number, eaf.annotations))
+    assert eaf.maxts == max(map(id_number, eaf.timeslots))
+
+
+def test_add_textgrid_tiers_parsed(test_dir):
+    # Parsed linguistic types don't always have constraints
+    eaf = Eaf(str(test_dir / 'sample_2.8.eaf'))
+    begin, end, _ = sorted(eaf.get_annotation_data_for_tier('text'))[0]
+    tg = TextGrid(xmax=end / 1000.0)
+    tg.add_tier('words').add_interval(begin / 1000.0, end / 1000.0, 'w')
+    added = eaf.add_textgrid_tiers(tg, 'text', prefix='tg-')
+    assert eaf.get_parameters_for_tier('tg-words')['LINGUISTIC_TYPE_REF'] ==\
+        'gest_included'
+    assert eaf.get_annotation_data_for_tier('tg-words') == [(begin, end, 'w')]
+    assert len(added['tg-words']) == 1
+
+
+def test_indent():
+    from xml.etree import ElementTree
+    root = ElementTree.fromstring('<a><b><c>x</c><d/></b><e>y</e></a>')
+    indent(root)
+    assert ElementTree.tostring(root, encoding='unicode') == (
+        '<a>\n\t<b>\n\t\t<c>x</c>\n\t\t<d />\n\t\t</b>\n'
+        '\t<e>y</e>\n\t</a>\n')
+    # Deeper than the recursion limit
+    deep = el = ElementTree.Element('n')
+    for _ in range(5000):
+        el = ElementTree.SubElement(el, 'n')
+    indent(deep)
+    assert el.tail == '\n' + 5000 * '\t'
+
+
+def test_to_adocument_time_order():
+    eaf = Eaf()
+    eaf.add_tier('tier1')
+    eaf.add_annotation('tier1', 0, 100, 'a')
+    eaf.timeslots['ts10'] = 300
+    eaf.timeslots['ts9'] = None
+    eaf.timeslots['slot2'] = 200
+    order = [(ts.get('TIME_SLOT_ID'), ts.get('TIME_VALUE'))
+             for ts in to_adocument(eaf).find('TIME_ORDER')]
+    assert order == [('slot2', '200'), ('ts2', '0'), ('ts3', '100'),
+                     ('ts9', None), ('ts10', '300')]
+
+
+def test_eaf_from_chat(tmp_path):
+    path = tmp_path / 'test.cha'
+    path.write_text(CHAT + u'@End\n', encoding='utf8')
+    eaf = eaf_from_chat(str(path))
+    assert sorted(eaf.get_tier_names()) == [
+        'CHI', 'CHI_mor', 'MOT', 'MOT_com', 'MOT_mor', 'default']
+    assert eaf.get_annotation_data_for_tier('CHI') == [
+        (0, 1000, u'hello thére .')]
+    assert sorted(eaf.get_annotation_data_for_tier('MOT_mor')) == [
+        (1000, 2000, 'co|hi continued .', 'hi .')]
+    assert eaf.get_annotation_data_for_tier('MOT_com') == [
+        (1000, 2000, 'laughs', 'hi .')]
+    assert eaf.get_parameters_for_tier('MOT_mor')['PARENT_REF'] == 'MOT'
+
+    path.write_text(CHAT, encoding='utf8')
+    with pytest.raises(StopIteration):
+        eaf_from_chat(str(path))
+
+
+def test_eafs_from_chat(tmp_path):
+    tmp_path.joinpath('b').mkdir()
+    tmp_path.joinpath('a.cha').write_text(CHAT + u'@End\n', encoding='utf8')
+    tmp_path.joinpath('b', 'c.cha').write_text(
+        CHAT.replace(u'@UTF8\n', u'').replace(u'é', u'e') + u'@End\n',
+        encoding='latin-1')
+    tmp_path.joinpath('b', 'broken.cha').write_text(CHAT, encoding='utf8')
+    with pytest.warns(UserWarning):
+        eafs = list(eafs_from_chat(str(tmp_path)))
+    assert [path.name for path, _ in eafs] == ['a.cha', 'c.cha']
+    assert eafs[1][1].get_annotation_data_for_tier('CHI') == [
+        (0, 1000, u'hello there .')]
+
+
 def test_to_textgrid(test_dir):
     _ = Eaf(str(test_dir / 'sample_2.7.eaf')).to_textgrid()
@@ -0,0 +1,122 @@
+import pytest
+
+from pympi import Eaf, TextGrid
+from pympi.Evaluation import align_labels, compare_tiers, evaluate,\
+    evaluate_corpus, merge_comparisons, offset_statistics
+
+
+def test_align_labels():
+    ref = [(0, 1, 'a'), (1, 2, 'b'), (2, 3, 'c'), (3, 4, 'd')]
+    hyp = [(0, 1, 'a'), (1, 2, 'x'), (2, 3, 'c'), (3, 3.5, 'e'),
+           (3.5, 4, 'd')]
+    assert align_labels(ref, hyp) == [
+        (ref[0], hyp[0]), (ref[1], hyp[1]), (ref[2], hyp[2]),
+        (None, hyp[3]), (ref[3], hyp[4])]
+    assert align_labels(ref, []) == [(r, None) for r in ref]
+    assert align_labels([], hyp) == [(None, h) for h in hyp]
+    # Regions between the anchors use the edit distance
+    ref = [(0, 1, 'a'), (1, 2, 'b'), (2, 3, 'c'), (3, 4, 'z')]
+    hyp = [(0, 1, 'x'), (1, 2, 'y'), (2, 3, 'c')]
+    assert align_labels(ref, hyp) == [
+        (ref[0], hyp[0]), (ref[1], hyp[1]), (ref[2], hyp[2]), (ref[3], None)]
+
+
+def test_align_labels_repeated():
+    ref = [(k, k + 1, 'a') for k in range(4)]
+    hyp = [(0, 1, 'b')] + ref[1:]
+    assert compare_tiers(ref, hyp) == {
+        'matches': 3, 'substitutions': 1, 'deletions': 0, 'insertions': 0,
+        'offsets': {'a': [0] * 6}}
+
+    def cost(pairs):
+        return sum(1 for r, h in pairs if r is None or h is None or
+                   r[2] != h[2])
+
+    def distance(a, b):
+        row = list(range(len(b) + 1))
+        for i, x in enumerate(a, 1):
+            previous, row = row, [i]
+            for j, y in enumerate(b, 1):
+                row.append(min(previous[j - 1] + (x[2] != y[2]),
+                               previous[j] + 1, row[j - 1] + 1))
+        return row[-1]
+    import random
+    rng = random.Random(0)
+    for _ in range(500):
+        ref = [(k, k + 1, rng.choice('abc'))
+               for k in range(rng.randint(0, 20))]
+        hyp = [(k, k + 1, rng.choice('abc'))
+               for k in range(rng.randint(0, 20))]
+        pairs = align_labels(ref, hyp)
+        assert [r for r, _ in pairs if r is not None] == ref
+        assert [h for _, h in pairs if h is not None] == hyp
+        assert cost(pairs) == distance(ref, hyp)
+
+
+def test_compare_tiers():
+    ref = [(0, 1, 'a'), (1, 2, 'b'), (2, 3, 'a')]
+    hyp = [(0, 1.5, 'a'), (1.5, 2, 'x'), (2, 3, 'a'), (3, 4, 'c')]
+    result = compare_tiers(ref, hyp)
+    assert result == {'matches': 2, 'substitutions': 1, 'deletions': 0,
+                      'insertions': 1, 'offsets': {'a': [0, 0.5, 0, 0]}}
+    merged = merge_comparisons([result, compare_tiers(ref, ref[:2])])
+    assert merged['matches'] == 4
+    assert merged['deletions'] == 1
+    assert merged['offsets'] == {'a': [0, 0.5, 0, 0, 0, 0], 'b': [0, 0]}
+
+
+def test_offset_statistics():
+    stats = offset_statistics([0.01, -0.02, 0.03, 0.06], (0.01, 0.05))
+    assert stats['count'] == 4
+    assert stats['mean'] == pytest.approx(0.02)
+    assert stats['mean_absolute'] == pytest.approx(0.03)
+    assert stats['median_absolute'] == pytest.approx(0.025)
+    assert stats['rmse'] == pytest.approx((0.005 / 4) ** 0.5)
+    assert stats['within'] == {0.01: 25.0, 0.05: 75.0}
+    assert offset_statistics([1.51 - 1.5], (0.01,))['within'] == {0.01: 100}
+    assert offset_statistics([], (0.01,)) == {
+        'count': 0, 'mean': None, 'mean_absolute': None,
+        'median_absolute': None, 'rmse': None, 'within': {0.01: None}}
+
+
+def alignments():
+    eaf = Eaf()
+    eaf.add_tier('words')
+    eaf.add_annotations('words', [(0, 1000, 'a'), (1000, 2000, 'b'),
+                                  (2000, 3000, 'a')])
+    tg = TextGrid(xmax=4)
+    tg.add_tier('words').add_intervals([
+        (0, 1.01, 'a'), (1.01, 2, 'b'), (2, 2.5, ''), (2.5, 3.1, 'a')])
+    return eaf, tg
+
+
+def test_evaluate():
+    eaf, tg = alignments()
+    result = evaluate(eaf, tg, 'words', tolerances=(0.01, 0.1))
+    assert result['matches'] == 3
+    assert result['insertions'] == 0
+    assert result['boundaries']['count'] == 6
+    assert result['boundaries']['within'] == pytest.approx(
+        {0.01: 400 / 6.0, 0.1: 500 / 6.0})
+    assert sorted(result['labels']) == ['a', 'b']
+    assert result['labels']['b']['mean'] == pytest.approx(0.005)
+    assert evaluate(eaf, tg, 'words', skipempty=False)['insertions'] == 1
+    assert evaluate(eaf, eaf, 'words')['boundaries']['rmse'] == 0
+    with pytest.raises(KeyError):
+        evaluate(eaf, tg, 'none')
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_evaluate_corpus(processes, tmp_path):
+    eaf, tg = alignments()
+    eaf.to_file(str(tmp_path / 'ref.eaf'))
+    tg.to_file(str(tmp_path / 'hyp.TextGrid'))
+    pairs = [(str(tmp_path / 'ref.eaf'), str(tmp_path / 'hyp.TextGrid')),
+             (str(tmp_path / 'hyp.TextGrid'), str(tmp_path / 'hyp.TextGrid'))]
+    per_file, total = evaluate_corpus(pairs, 'words', processes=processes)
+    assert per_file[0] == evaluate(eaf, tg, 'words')
+    assert per_file[1]['boundaries']['mean_absolute'] == 0
+    assert total['matches'] == 6
+    assert total['boundaries']['count'] == 12
+    with pytest.raises(ValueError):
+        evaluate_corpus(pairs, 'words', processes=0)
@@ -0,0 +1,202 @@
+import array
+
+import pytest
+
+from pympi import Eaf, TextGrid
+from pympi.Intervals import complement, decode_frames, difference,\
+    get_intervals, get_time_interval, intersection, interval_join,\
+    overlap_matrix, rasterize, rasterize_tiers, symmetric_difference, union,\
+    write_tier
+
+
+def brute_force(left, right):
+    for a in left:
+        for b in right:
+            overlap = min(a[1], b[1]) - max(a[0], b[0])
+            if overlap > 0 or overlap == 0 and (
+                    a[0] == a[1] or b[0] == b[1]):
+                yield (a, b, overlap)
+
+
+def test_get_intervals():
+    eaf = Eaf()
+    eaf.add_tier('tier1')
+    eaf.add_annotation('tier1', 1000, 2000, 'b')
+    eaf.add_annotation('tier1', 0, 500, 'a')
+    eaf.timeslots[eaf.generate_ts_id()] = None
+    assert get_intervals(eaf, 'tier1') == [(0, 500, 'a'), (1000, 2000, 'b')]
+    assert get_intervals(eaf, 'tier1', seconds=True) ==\
+        [(0, 0.5, 'a'), (1, 2, 'b')]
+
+    tg = TextGrid(xmax=10)
+    tg.add_tier('words').add_interval(1, 2, 'x')
+    tg.add_tier('points', 'TextTier').add_point(3, 'p')
+    assert get_intervals(tg, 'words') == [(1, 2, 'x')]
+    assert get_intervals(tg.get_tier('points')) == [(3, 3, 'p')]
+    assert get_intervals([(2, 3, 'y'), (1, 2, 'x')]) ==\
+        [(1, 2, 'x'), (2, 3, 'y')]
+    with pytest.raises(KeyError):
+        get_intervals(eaf, 'tier2')
+
+
+def test_interval_join():
+    utterances = [(0, 1000, 'u1'), (1000, 3000, 'u2'), (5000, 6000, 'u3')]
+    words = [(0, 400, 'w1'), (400, 1200, 'w2'), (2000, 2500, 'w3'),
+             (2900, 5500, 'w4'), (3000, 3000, 'p1'), (7000, 8000, 'w5')]
+    pairs = list(interval_join(utterances, words))
+    assert sorted(pairs) == sorted(brute_force(utterances, words))
+    assert (utterances[1], words[4], 0) in pairs
+    assert (utterances[0], words[1], 600) in pairs
+    assert [(a[2], b[2]) for a, b, _ in interval_join(
+        utterances, words, 'contains')] ==\
+        [('u1', 'w1'), ('u2', 'w3'), ('u2', 'p1')]
+    assert [(a[2], b[2]) for a, b, _ in interval_join(
+        words, utterances, 'within')] ==\
+        [('w1', 'u1'), ('w3', 'u2'), ('p1', 'u2')]
+    assert [(a[2], b[2]) for a, b, _ in interval_join(
+        utterances, words, min_ratio=0.5)] ==\
+        [('u1', 'w1'), ('u1', 'w2'), ('u2', 'w3'), ('u2', 'p1'),
+         ('u3', 'w4')]
+    assert [b[2] for _, b, _ in interval_join(
+        utterances, words, lambda a, b, o: b[2] == 'w4')] == ['w4', 'w4']
+    with pytest.raises(ValueError):
+        list(interval_join(utterances, words, 'touches'))
+
+
+def test_interval_join_random():
+    import random
+    rng = random.Random(0)
+
+    def generate():
+        intervals = []
+        for i in range(200):
+            begin = rng.randint(0, 1000)
+            intervals.append((begin, begin + rng.randint(0, 50), i))
+        return intervals
+    left, right = generate(), generate()
+    assert sorted(interval_join(left, right)) ==\
+        sorted(brute_force(left, right))
+
+
+def test_set_operations():
+    a = [(0, 10, 'a'), (5, 15, 'a'), (20, 30, 'a')]
+    b = [(10, 25, 'b'), (40, 50, 'b')]
+    c = [(0, 100, 'c')]
+    assert union(a, b) == [(0, 30), (40, 50)]
+    assert union() == []
+    assert intersection(a, b) == [(10, 15), (20, 25)]
+    assert intersection(a, b, [(12, 22)]) == [(12, 15), (20, 22)]
+    assert difference(a, b) == [(0, 10), (25, 30)]
+    assert difference(c, a, b) == [(30, 40), (50, 100)]
+    assert symmetric_difference(a, b) == [(0, 10), (15, 20), (25, 30),
+                                          (40, 50)]
+    assert symmetric_difference(a, b, c) == [(10, 15), (20, 25), (30, 40),
+                                             (50, 100)]
+    assert complement([a, b], -5, 45) == [(-5, 0), (30, 40)]
+    assert complement([a], 2, 12) == []
+    assert complement([], 0, 5) == [(0, 5)]
+
+
+def test_overlap_matrix():
+    a = [(0, 10, 'a'), (10, 20, 'a')]
+    b = [(5, 15, 'b'), (5, 8, 'b')]
+    c = [(15, 30, 'c'), (31, 32, 'c')]
+    durations, counts = overlap_matrix([a, b, c, []])
+    assert durations == [[20, 10, 5, 0], [10, 10, 0, 0], [5, 0, 16, 0],
+                         [0, 0, 0, 0]]
+    assert counts == [[1, 1, 1, 0], [1, 1, 0, 0], [1, 0, 2, 0],
+                      [0, 0, 0, 0]]
+    # Starting at the same time counts once, touching is no overlap
+    assert overlap_matrix([[(0, 5)], [(0, 5), (6, 7)], [(5, 6)]])[1] ==\
+        [[1, 1, 0], [1, 2, 0], [0, 0, 1]]
+    assert overlap_matrix([]) == ([], [])
+
+    import random
+    rng = random.Random(0)
+    lists = [[(b, b + rng.randint(1, 50)) for b in (
+        rng.randint(0, 1000) for _ in range(50))] for _ in range(4)]
+    durations, counts = overlap_matrix(lists)
+    for i, x in enumerate(lists):
+        for j, y in enumerate(lists):
+            segments = intersection(x, y)
+            assert durations[i][j] == sum(e - b for b, e in segments)
+            assert counts[i][j] == len(segments)
+
+
+def test_write_tier():
+    eaf = Eaf()
+    eaf.add_tier('spk1')
+    eaf.add_tier('spk2')
+    eaf.add_annotations('spk1', [(0, 1000, 'x'), (2000, 3000, 'y')])
+    eaf.add_annotations('spk2', [(500, 2500, 'z')])
+    spk1, spk2 = get_intervals(eaf, 'spk1'), get_intervals(eaf, 'spk2')
+    write_tier(eaf, 'both', intersection(spk1, spk2), 'both')
+    assert eaf.get_annotation_data_for_tier('both') ==\
+        [(500, 1000, 'both'), (2000, 2500, 'both')]
+    write_tier(eaf, 'silence', complement(
+        [spk1, spk2], *get_time_interval(eaf)))
+    assert eaf.get_annotation_data_for_tier('silence') == []
+
+    tg = TextGrid(xmax=4)
+    write_tier(tg, 'anyone', union(
+        get_intervals(eaf, 'spk1', seconds=True),
+        get_intervals(eaf, 'spk2', seconds=True)), 'speech')
+    assert tg.get_tier('anyone').intervals == [(0, 3, 'speech')]
+    tier = write_tier(tg, 'silence', complement(
+        [tg.get_tier('anyone').intervals], *get_time_interval(tg)))
+    assert tier.intervals == [(3, 4, '')]
+    write_tier(eaf, 'silence', tier.intervals, seconds=True)
+    assert eaf.get_annotation_data_for_tier('silence') ==\
+        [(3000, 4000, '')]
+
+
+def test_rasterize():
+    intervals = [(0.0, 0.03, 'sil'), (0.03, 0.071, 'a'), (0.1, 0.12, 'b')]
+    frames, vocabulary = rasterize([intervals])
+    assert vocabulary == {'a': 1, 'b': 2, 'sil': 3}
+    assert list(frames) == [3, 3, 3, 1, 1, 1, 1, 1, 0, 0, 2, 2]
+    frames, _ = rasterize([intervals], frame_rate=50, offset=0.02,
+                          vocabulary=['', 'sil', 'a', 'b'], length=3)
+    assert list(frames) == [1, 2, 2]
+    with pytest.raises(KeyError):
+        rasterize([intervals], vocabulary=['', 'a', 'b'])
+
+    eaf = Eaf()
+    eaf.add_tier('spk1')
+    eaf.add_tier('spk2')
+    eaf.add_annotation('spk1', 0, 40, 'x')
+    eaf.add_annotation('spk2', 20, 50, 'y')
+    frames, vocabulary = rasterize_tiers(eaf, ['spk1', 'spk2'],
+                                         multi_hot=True)
+    assert vocabulary == {'x': 1, 'y': 2}
+    assert [list(f) for f in frames] == [
+        [0, 0, 0, 0, 0], [1, 1, 1, 1, 0], [0, 0, 1, 1, 1]]
+    assert list(rasterize_tiers(eaf, ['spk1', 'spk2'])[0]) == [1, 1, 2, 2, 2]
+    assert rasterize([[]]) == (array.array('i'), {})
+
+
+def test_decode_frames():
+    frames = array.array('i', [0, 1, 1, 0, 1, 2, 2, 2, 0, 0, 0, 2])
+    assert decode_frames(frames) ==\
+        [(0.01, 0.03, 1), (0.04, 0.05, 1), (0.05, 0.08, 2), (0.11, 0.12, 2)]
+    assert decode_frames(frames, vocabulary=['', 'a', 'b'], max_gap=0.01,
+                         min_duration=0.02) ==\
+        [(0.01, 0.05, 'a'), (0.05, 0.08, 'b')]
+    assert decode_frames(frames, 10, 1, {'a': 1, 'b': 2}, max_gap=0.3) ==\
+        [(1.1, 1.5, 'a'), (1.5, 2.2, 'b')]
+    assert decode_frames([]) == []
+
+    # Round trip with shared timeslots
+    eaf = Eaf()
+    write_tier(eaf, 'vad', decode_frames(frames, vocabulary=['', 'a', 'b']),
+               seconds=True)
+    assert eaf.get_annotation_data_for_tier('vad') == [
+        (10, 30, 'a'), (40, 50, 'a'), (50, 80, 'b'), (110, 120, 'b')]
+    assert len(eaf.timeslots) == 7
+    assert list(rasterize_tiers(eaf, ['vad'], vocabulary=['', 'a', 'b'])[0])\
+        == list(frames)
+
+    tg = TextGrid(xmax=1)
+    tier = tg.add_tier('vad')
+    write_tier(tier, None, decode_frames(frames, max_gap=0.01))
+    assert [i[2] for i in tier.intervals] == [1, 2, 2]
@@ -89,6 +89,18 @@ class PraatTest(unittest.TestCase):
 
         self.assertEqual(self.tg.tiers[1], self.tg.get_tier(tier2.name))
 
+        # The name index follows changes to the tiers
+        self.tg.add_tier('tier1', number=1)
+        self.assertEqual(self.tg.tiers[0], self.tg.get_tier('tier1'))
+        tier2.name = 'tier2a'
+        self.assertEqual(tier2, self.tg.get_tier('tier2a'))
+        self.assertRaises(IndexError, self.tg.get_tier, 'tier2')
+        self.tg.remove_tier('tier1')
+        self.assertRaises(IndexError, self.tg.get_tier, 'tier1')
+        self.tg.tiers.append(tier1)
+        self.tg.reindex_tiers()
+        self.assertEqual(tier1, self.tg.get_tier('tier1'))
+
     def test_change_tier_name(self):
         self.assertRaises(Exception,
                           self.tg.change_tier_name, -1, 'b')
@@ -145,6 +157,24 @@ class PraatTest(unittest.TestCase):
                                  (1500, 1530, 'point1'),
                                  (3500, 3530, 'point3')]))
 
+    def test_to_eaf_shared_timeslots(self):
+        tier1 = self.tg.add_tier('words')
+        tier2 = self.tg.add_tier('phones')
+        tier1.add_intervals([(0, 1, ''), (1, 2, 'ab'), (2, 3, 'c')])
+        tier2.add_intervals([(1, 1.5, 'a'), (1.5, 2, 'b'), (2, 3, 'c')])
+        eaf = self.tg.to_eaf()
+        self.assertEqual(eaf.get_annotation_data_for_tier('words'),
+                         [(1000, 2000, 'ab'), (2000, 3000, 'c')])
+        self.assertEqual(eaf.get_annotation_data_for_tier('phones'),
+                         [(1000, 1500, 'a'), (1500, 2000, 'b'),
+                          (2000, 3000, 'c')])
+        self.assertEqual(sorted(eaf.timeslots.values()),
+                         [1000, 1500, 2000, 3000])
+        eaf = self.tg.to_eaf(False)
+        self.assertEqual(eaf.get_annotation_data_for_tier('words')[0],
+                         (0, 1000, ''))
+        self.assertEqual(len(eaf.timeslots), 5)
+
 # Test all the Praat.Tier functions
     def setup_tier(self):
         self.tier1 = self.tg.add_tier('tier1')
@@ -174,6 +204,22 @@ class PraatTest(unittest.TestCase):
 
         self.tier1.add_interval(5.5, 6.5, 't', False)
 
+    def test_add_intervals(self):
+        self.setup_tier()
+        self.assertRaises(Exception,
+                          self.tier2.add_intervals, [(5, 6, 'a')])
+        self.tier1.add_intervals([(6, 7, 'b'), (5, 6, 'a')])
+        self.assertEqual([(6, 7, 'b'), (5, 6, 'a')], self.tier1.intervals)
+        self.assertRaises(Exception, self.tier1.add_intervals,
+                          [(7, 9, 'c'), (8, 8.5, 'd')])
+        self.assertRaises(Exception, self.tier1.add_intervals,
+                          [(5.5, 5.7, 'c')])
+        self.assertRaises(Exception, self.tier1.add_intervals,
+                          [(9, 8, 'c')])
+        self.assertEqual([(6, 7, 'b'), (5, 6, 'a')], self.tier1.intervals)
+        self.tier1.add_intervals([(5.5, 6.5, 't')], False)
+        self.assertEqual(len(self.tier1.intervals), 3)
+
     def test_remove_interval(self):
         self.setup_tier()
         self.assertRaises(Exception, self.tier2.remove_interval, 5)
@@ -233,6 +279,59 @@ class PraatTest(unittest.TestCase):
         self.tier2.clear_intervals()
         self.assertEqual([], self.tier2.intervals)
 
+    def test_interval_queries(self):
+        self.setup_tier()
+        self.assertIsNone(self.tier1.interval_at(5))
+        self.assertEqual([], self.tier1.intervals_between(0, 10))
+        self.tier1.add_interval(6, 7, 'b')
+        self.tier1.add_interval(5, 6, 'a')
+        self.tier1.add_interval(8, 9, 'c')
+        self.assertRaises(Exception, self.tier2.interval_at, 5)
+        self.assertEqual((5, 6, 'a'), self.tier1.interval_at(5.5))
+        self.assertEqual((6, 7, 'b'), self.tier1.interval_at(6))
+        self.assertEqual((8, 9, 'c'), self.tier1.interval_at(9))
+        self.assertIsNone(self.tier1.interval_at(7.5))
+        self.assertIsNone(self.tier1.interval_at(4))
+        self.assertEqual([(6, 7, 'b'), (8, 9, 'c')],
+                         self.tier1.intervals_between(6, 8.5))
+        self.assertEqual([], self.tier1.intervals_between(7, 8))
+        self.assertEqual((6, 7, 'b'), self.tier1.interval_before(7.5))
+        self.assertEqual((6, 7, 'b'), self.tier1.interval_before(7))
+        self.assertIsNone(self.tier1.interval_before(5.5))
+        self.assertEqual((8, 9, 'c'), self.tier1.interval_after(7.5))
+        self.assertEqual((6, 7, 'b'), self.tier1.interval_after(6))
+        self.assertIsNone(self.tier1.interval_after(8.5))
+
+        # Changes through the methods are picked up
+        self.tier1.add_interval(10, 11, 'd')
+        self.assertEqual((10, 11, 'd'), self.tier1.interval_at(10.5))
+        self.tier1.remove_interval(10.5)
+        self.assertIsNone(self.tier1.interval_at(10.5))
+        # Direct changes need a reindex
+        self.tier1.intervals[0] = (6, 7, 'X')
+        self.tier1.reindex()
+        self.assertEqual((6, 7, 'X'), self.tier1.interval_at(6.5))
+
+    def test_point_queries(self):
+        self.setup_tier()
+        self.assertIsNone(self.tier2.nearest_point(5))
+        self.tier2.add_point(7, 'c')
+        self.tier2.add_point(5, 'a')
+        self.tier2.add_point(6, 'b')
+        self.assertRaises(Exception, self.tier1.nearest_point, 5)
+        self.assertEqual((5, 'a'), self.tier2.nearest_point(0))
+        self.assertEqual((6, 'b'), self.tier2.nearest_point(6.2))
+        self.assertEqual((5, 'a'), self.tier2.nearest_point(5.5))
+        self.assertEqual((7, 'c'), self.tier2.nearest_point(10))
+        self.assertEqual([(5, 'a'), (6, 'b')],
+                         self.tier2.intervals_between(5, 6))
+        self.assertEqual((5, 'a'), self.tier2.interval_before(6))
+        self.assertEqual((7, 'c'), self.tier2.interval_after(6))
+        self.assertIsNone(self.tier2.interval_before(5))
+        self.assertIsNone(self.tier2.interval_after(7))
+        self.tier2.remove_point(5)
+        self.assertEqual((6, 'b'), self.tier2.nearest_point(5))
+
 
 @pytest.mark.parametrize('codec', ['utf-8', 'latin_1', 'mac_roman'])
 def test_to_file(codec, tmp_path):